@@ -1,12 +1,26 @@
 import os
 from datetime import datetime
 import time
+# Taken before the other imports, so a cold start's first run includes their cost
+RUN_STARTED = time.perf_counter()
+import uuid
 import streamlit as st
-from moviepy import VideoFileClip, AudioFileClip, concatenate_videoclips, CompositeAudioClip
 import toml
-import streamlit_logger as sl
 
+import streamlit_logger as sl
 import utility_functions as uf
+import upload_cache as uc
+import video_engine as ve
+import render_jobs as rj
+import render_cache as rc
+import media_server as ms
+import previews as pv
+import keyframe_index as ki
+import ffmpeg_utils as ff
+import encoding_profiles as ep
+import janitor
+import metrics
+from resource_governor import governor, AdmissionError
 
 # ==============================
 # Streamlit Page Config
@@ -25,9 +39,26 @@ st.divider()
 # Sidebar Settings
 # ==============================
 st.sidebar.header("⚙️ Settings")
-codec = st.sidebar.selectbox("Video Codec", ["libx264", "mpeg4", "libvpx"], index=0)
-audio_codec = st.sidebar.selectbox("Audio Codec", ["aac", "libvorbis", "mp3"], index=0)
+codec = st.sidebar.selectbox("Video Codec", ve.VIDEO_CODECS, index=0)
+audio_codec = st.sidebar.selectbox("Audio Codec", ve.AUDIO_CODECS, index=0)
+engine = st.sidebar.selectbox("Render Engine", ve.RENDER_ENGINES, index=0,
+                              help="ffmpeg renders each tool as a single filtergraph process; moviepy is the fallback.")
+segments = st.sidebar.number_input("Parallel Segments", 0, 64, 0,
+                                   help=f"Split long re-encodes into segments encoded in parallel. 0 = automatic (above {ve.SEGMENT_THRESHOLD:.0f}s).") or None
+encoding_profile = st.sidebar.selectbox("Encoding Profile", ep.PROFILE_NAMES, index=0,
+                                        help="auto: faster presets while the server is busy, higher quality when idle.")
+with st.sidebar.expander("📊 Server Load"):
+    load = governor.utilisation()
+    st.write(f"Renders: {load['renders_running']}/{load['renders_limit']} running, {load['renders_queued']} queued")
+    st.write(f"Open readers: {load['readers_open']}/{load['readers_limit']}")
+    cache = rc.cache_stats()
+    st.write(f"Render cache: {cache['hits']} hits, {cache['misses']} misses, {cache['entries']} entries")
+    st.write(f"Janitor: {janitor.stats['runs']} sweeps, {janitor.stats['jobs_removed']} jobs and "
+             f"{janitor.stats['orphans_removed']} orphans removed")
 st.sidebar.divider()
+# Expired renders, stale job directories and orphaned spools are reclaimed in the background
+janitor.ensure_janitor()
+ms.ensure_metrics_server()
 # ==============================
 # Config & Theme
 # ==============================
@@ -37,15 +68,21 @@ THEMES = {
     "Dark": {"theme": {"base": "dark", "borderColor": "mediumSlateBlue"}}
 }
 
+@st.cache_data(show_spinner=False)
+def load_theme(path, mtime):
+    # mtime is part of the cache key: the file is parsed again only after it changes
+    try:
+        config = toml.load(path)
+        base = config.get("theme", {}).get("base", "Light")
+        return "Dark" if base.lower() == "dark" else "Light"
+    except:
+        return "Light"
+
 def get_current_theme():
-    if os.path.exists(CONFIG_PATH):
-        try:
-            config = toml.load(CONFIG_PATH)
-            base = config.get("theme", {}).get("base", "Light")
-            return "Dark" if base.lower() == "dark" else "Light"
-        except:
-            return "Light"
-    return "Light"
+    try:
+        return load_theme(CONFIG_PATH, os.path.getmtime(CONFIG_PATH))
+    except OSError:
+        return "Light"
 
 current_theme = get_current_theme()
 theme_choice = st.sidebar.radio("Select Theme", list(THEMES.keys()),
@@ -66,119 +103,250 @@ def cleanup_files(*files, new_keys={}):
         try: f.close()
         except: pass
     uf.remove_temp_files(*files)
+    # Only this session's state is reset; shared uploads and renders are evicted by their caches
     for key, value in new_keys.items():
         st.session_state[key] = value
-    st.cache_data.clear()
-    st.cache_resource.clear()
+        if key in st.query_params:
+            del st.query_params[key]
     st.rerun()
 
-def load_clips(video_path=None, audio_path=None):
-    video = VideoFileClip(video_path) if video_path else None
-    audio = AudioFileClip(audio_path) if audio_path else None
-    return video, audio
+def load_durations(video_path=None, audio_path=None):
+    durations = []
+    for path, kind in ((video_path, "video"), (audio_path, "audio")):
+        if not path:
+            durations.append(None)
+            continue
+        # Probe results are cached per content hash, so reruns never open a reader again
+        meta = uc.cached_metadata(path)
+        if meta is None:
+            with governor.reader_slots(st.session_state.session_id):
+                meta = uc.probe_metadata(path, kind)
+        durations.append(meta["duration"])
+    return tuple(durations)
 
 # ==============================
 # Session Keys & Tools
 # ==============================
 TOOLS = {
-    "Merge Audio with Video": {"video":"video_merge","audio":"audio_merge","output":"merge_output","video_key":"video_key_merge","audio_key":"audio_key_merge"},
-    "Trim & Create Subclips": {"video":"subclip_temp","output":"subclip_output","key":"subclip_key"},
-    "Concatenate Videos": {"clips":"concat_clips","files":"concat_files","output":"concat_output","key":"concat_key"},
-    "Add Background Music": {"video":"video_bg","audio":"audio_bg","output":"bg_output","video_key":"video_key_bg","audio_key":"audio_key_bg"}
+    "Merge Audio with Video": {"video":"video_merge","audio":"audio_merge","output":"merge_output","job":"merge_job","video_key":"video_key_merge","audio_key":"audio_key_merge"},
+    "Trim & Create Subclips": {"video":"subclip_temp","output":"subclip_output","job":"subclip_job","key":"subclip_key"},
+    "Concatenate Videos": {"clips":"concat_clips","files":"concat_files","output":"concat_output","job":"concat_job","key":"concat_key"},
+    "Add Background Music": {"video":"video_bg","audio":"audio_bg","output":"bg_output","job":"bg_job","video_key":"video_key_bg","audio_key":"audio_key_bg"}
 }
 
 option = st.radio("Select Functionality", list(TOOLS.keys()))
 
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 # Initialize session_state keys
 for key in TOOLS[option].values():
     if key not in st.session_state:
         st.session_state[key] = [] if "clips" in key or "files" in key else uf.generate_key(key) if "key" in key else None
 
+# Restore render jobs after a reconnect (job IDs are kept in the URL)
+job_key = TOOLS[option]["job"]
+if st.session_state[job_key] is None and job_key in st.query_params:
+    st.session_state[job_key] = st.query_params[job_key]
+
 def remove_uploaded_files():
     keys = TOOLS[option]
     if option == "Concatenate Videos":
         cleanup_files(
             *st.session_state.get(keys["clips"], []),
             *st.session_state.get(keys["files"], []),
-            st.session_state.get(keys["output"]),
-            new_keys={keys["clips"]: [], keys["files"]: [], keys["output"]: None, keys["key"]: uf.generate_key(keys["key"])}
+            new_keys={keys["clips"]: [], keys["files"]: [], keys["output"]: None, keys["job"]: None, keys["key"]: uf.generate_key(keys["key"])}
         )
     else:
         cleanup_files(
             st.session_state.get(keys.get("video")),
             st.session_state.get(keys.get("audio")),
-            st.session_state.get(keys.get("output")),
             new_keys={k: uf.generate_key(k) if "key" in k else None for k in keys.values()}
         )
 
 # ==============================
 # Tool Implementations
 # ==============================
+def show_output(filename, name, label="Download"):
+    is_video = name.lower().endswith((".mp4", ".mov", ".avi", ".mkv", ".webm"))
+    # Served from disk with range requests, so large outputs never load into server memory
+    if ms.ensure_server():
+        if is_video:
+            st.video(ms.media_url(filename))
+        st.link_button(label, ms.media_url(filename, download=True))
+        return
+    if is_video:
+        st.video(filename)
+    with open(filename, "rb") as f:
+        st.download_button(label, f, file_name=name)
+
+def start_job(tool, tool_keys, filename, **kwargs):
+    # Keyed on the requested profile: "auto" resolves differently while the first press is still rendering,
+    # and a repeated press must find that job. The job record names the profile actually used.
+    params = {"codec": codec, "audio_codec": audio_codec, "engine": engine, "segments": segments,
+              "profile": encoding_profile, **kwargs}
+    inputs = kwargs.get("paths") or [kwargs[k] for k in ("video_path", "audio_path") if k in kwargs]
+    cache_key = rc.render_key(tool, inputs, {k: v for k, v in params.items() if not k.endswith(("path", "paths"))})
+    params["profile"] = ep.choose_profile(encoding_profile, governor.utilisation())
+    job_id = rj.submit(tool, filename, session_id=st.session_state.session_id, cache_key=cache_key, **params)
+    st.session_state[tool_keys["job"]] = job_id
+    st.session_state[tool_keys["output"]] = rj.status(job_id)["output"]
+    st.query_params[tool_keys["job"]] = job_id
+
+@st.fragment(run_every=1.0)
+def poll_job(job_id):
+    job = rj.status(job_id)
+    if job is None or job["status"] not in rj.ACTIVE_STATUSES:
+        st.rerun()
+    text = f"⏳ Queued, position {job.get('position') or 1}" if job["status"] == "queued" else sl.format_progress(job.get("stats") or job)
+    st.progress(job["progress"], text=text)
+
+def show_job(tool_keys, done_message, label="Download"):
+    job = rj.status(st.session_state.get(tool_keys["job"]))
+    if job is None:
+        return None
+    if job["status"] in rj.ACTIVE_STATUSES:
+        poll_job(job["id"])
+    elif job["status"] == "done" and os.path.exists(job["output"]):
+        st.success(done_message)
+        if job.get("profile") and (job.get("speed") or {}).get("realtime"):
+            st.caption(f"Encoded with the {job['profile']} profile at {job['speed']['realtime']:.2f}x realtime")
+        show_output(job["output"], job["name"], label)
+    elif job["status"] == "failed":
+        st.error(f"Render failed: {job['error']}")
+    return job
+
+@st.fragment(run_every=2.0)
+def wait_for_previews(path):
+    if not pv.is_pending(path):
+        st.rerun()
+    st.caption("🎞️ Generating preview...")
+
+def show_previews(path, duration, start=None, end=None):
+    # Low-res proxy + thumbnail strip, generated once per upload in the background
+    pv.request_previews(path)
+    thumbs, proxy = pv.thumbnails_path(path), pv.proxy_path(path)
+    if thumbs:
+        st.image(thumbs, caption=f"One frame every {pv.thumb_interval(duration):.0f}s", use_container_width=True)
+    if proxy and start is not None:
+        st.video(proxy, start_time=int(start), end_time=int(end) + 1)
+    if pv.is_pending(path):
+        wait_for_previews(path)
+
+def load_keyframe_index(path):
+    # One ffprobe packet scan per upload, persisted next to it in the upload cache
+    try:
+        with governor.reader_slots(st.session_state.session_id):
+            return ki.load_index(path)
+    except ff.FFmpegError:
+        return None
+
+def snap_to_keyframes(index, start_key, end_key, duration):
+    st.session_state[start_key] = ki.keyframe_before(index, st.session_state[start_key])
+    after = ki.keyframe_after(index, st.session_state[end_key])
+    st.session_state[end_key] = min(after if after is not None else duration, duration)
+
 def merge_audio_with_video_ui():
     v_file = st.file_uploader("Upload Video", type=["mp4","mov","avi"], key=st.session_state.video_key_merge)
     a_file = st.file_uploader("Upload Audio", type=["mp3","wav"], key=st.session_state.audio_key_merge)
     if v_file and a_file:
         video_path = uf.save_temp_file(v_file, ".mp4")
         audio_path = uf.save_temp_file(a_file, ".mp3")
-        video, audio = load_clips(video_path, audio_path)
+        video_duration, audio_duration = load_durations(video_path, audio_path)
         col1, col2 = st.columns(2)
-        col1.success(f"🎥 {v_file.name} | {video.duration:.2f}s")
-        col2.success(f"🎵 {a_file.name} | {audio.duration:.2f}s")
+        col1.success(f"🎥 {v_file.name} | {video_duration:.2f}s")
+        col2.success(f"🎵 {a_file.name} | {audio_duration:.2f}s")
+        mode = st.radio("Render Mode", ["Fast (copy video stream)", "Re-encode video"], horizontal=True)
 
         if st.button("Merge Now"):
-            cut_audio = audio.subclipped(0, min(audio.duration, video.duration))
-            output_video = video.with_audio(cut_audio)
             filename = f"Merged__{datetime.now().strftime('%H%M%S')}.mp4"
-            st.session_state.merge_output = filename
-            output_video.write_videofile(filename, codec=codec, audio_codec=audio_codec, logger=sl.StreamlitLogger(int(output_video.fps*output_video.duration)))
-            st.success("✅ Merge Completed!")
-            st.video(filename)
-            with open(filename, "rb") as f:
-                st.download_button("⬇️ Download", f, file_name=filename)
-            uf.close_and_remove(output_video, video, audio)
+            start_job("merge_audio", TOOLS[option], filename, video_path=video_path, audio_path=audio_path,
+                      copy_video=mode.startswith("Fast"))
+    show_job(TOOLS[option], "✅ Merge Completed!", "⬇️ Download")
+
+def trim_options():
+    lossless = st.toggle("Lossless trim (re-encode only the edge GOPs, keeps source codec)", value=True)
+    snap = st.checkbox("Snap start to keyframe (no re-encode at all)", disabled=not lossless)
+    return lossless, snap
+
+def multi_cut_ui(video_path, duration):
+    text = st.text_area("Ranges — one per line as start - end (seconds, mm:ss or hh:mm:ss)", "0 - 5\n10 - 15")
+    try:
+        ranges = uf.parse_ranges(text)
+    except ValueError as e:
+        st.error(str(e))
+        ranges = []
+    if any(end > duration for _, end in ranges):
+        st.error(f"Ranges must end before {duration:.2f}s")
+        ranges = []
+    if ranges:
+        st.dataframe([{"Clip": i + 1, "Start": s, "End": e, "Length (s)": round(e - s, 2)} for i, (s, e) in enumerate(ranges)],
+                     hide_index=True)
+    show_previews(video_path, duration)
+    lossless, snap = trim_options()
+    # All clips come from one pass over the source (or parallel stream-copy cuts), bundled as a zip
+    if st.button("Export Clips (zip)", disabled=not ranges):
+        filename = f"Clips_{len(ranges)}_{datetime.now().strftime('%H%M%S')}.zip"
+        start_job("trim_many", TOOLS[option], filename, video_path=video_path,
+                  ranges=[list(r) for r in ranges], lossless=lossless, snap=snap)
+
+def single_cut_ui(video_path, duration):
+    index = load_keyframe_index(video_path)
+    start_key, end_key = f"trim_start_{uc.content_hash(video_path)}", f"trim_end_{uc.content_hash(video_path)}"
+    start = st.number_input("Start time (sec)", 0.0, duration, 0.0, key=start_key)
+    end = st.number_input("End time (sec)", 0.0, duration, min(5.0, duration), key=end_key)
+    if index:
+        st.button("🔑 Snap cut points to keyframes", on_click=snap_to_keyframes,
+                  args=(index, start_key, end_key, duration))
+        if start < end:
+            cost = ki.cut_cost(index, start, end)
+            st.caption(
+                f"Keyframes around start: {cost['keyframe_before']:.2f}s / "
+                f"{cost['keyframe_after'] if cost['keyframe_after'] is not None else duration:.2f}s · "
+                f"lossless cut re-encodes {cost['encode_frames']} frames and copies {cost['copy_frames']} · "
+                f"seeking to start decodes {cost['lead_in_frames']} frames"
+            )
+    show_previews(video_path, duration, start, end)
+    lossless, snap = trim_options()
+
+    if st.button("Create Subclip"):
+        if start < end:
+            filename = f"Subclip_{int(start)}-{int(end)}_{datetime.now().strftime('%H%M%S')}.mp4"
+            start_job("trim", TOOLS[option], filename, video_path=video_path, start=start, end=end,
+                      lossless=lossless, snap=snap)
+        else:
+            st.error("End time must be greater than start time")
 
 def trim_video_ui():
     video_file = st.file_uploader("Upload Video to Trim", type=["mp4","mov","avi"], key=st.session_state.subclip_key)
     if video_file:
         video_path = uf.save_temp_file(video_file, ".mp4")
-        video, _ = load_clips(video_path, None)
-        st.success(f"🎥 {video_file.name} | {video.duration:.2f}s")
-        start = st.number_input("Start time (sec)", 0.0, video.duration, 0.0)
-        end = st.number_input("End time (sec)", 0.0, video.duration, min(5.0, video.duration))
-
-        if st.button("Create Subclip"):
-            if start < end:
-                sub_clip = video.subclipped(start, end)
-                filename = f"Subclip_{int(start)}-{int(end)}_{datetime.now().strftime('%H%M%S')}.mp4"
-                st.session_state.subclip_output = filename
-                sub_clip.write_videofile(filename, codec=codec, audio_codec=audio_codec, logger=sl.StreamlitLogger(int(sub_clip.fps*sub_clip.duration)))
-                st.success("✅ Subclip Created!")
-                st.video(filename)
-                with open(filename, "rb") as f:
-                    st.download_button("Download", f, file_name=filename)
-                sub_clip.close()
-            else:
-                st.error("End time must be greater than start time")
+        duration, _ = load_durations(video_path, None)
+        st.success(f"🎥 {video_file.name} | {duration:.2f}s")
+        cut_mode = st.radio("Cut Mode", ["Single clip", "Multiple clips"], horizontal=True)
+        if cut_mode == "Multiple clips":
+            multi_cut_ui(video_path, duration)
+        else:
+            single_cut_ui(video_path, duration)
+    job = show_job(TOOLS[option], "✅ Subclip Created!")
+    if job and job["status"] == "done" and job["tool"] == "trim" and abs(job["result"] - job["params"]["start"]) > 1e-3:
+        st.info(f"Start snapped to keyframe at {job['result']:.2f}s")
 
 def concatenate_videos_ui():
     files = st.file_uploader("Upload Videos to Concatenate", type=["mp4","mov","avi"], accept_multiple_files=True, key=st.session_state.concat_key)
     if files:
-        clips = []
+        paths = []
         for f in files:
             temp_path = uf.save_temp_file(f, ".mp4")
-            clip = VideoFileClip(temp_path)
-            clips.append(clip)
-            st.info(f"📂 {f.name} | Duration: {clip.duration:.2f}s")
+            duration, _ = load_durations(temp_path)
+            paths.append(temp_path)
+            st.info(f"📂 {f.name} | Duration: {duration:.2f}s")
+            show_previews(temp_path, duration)
         if st.button("Concatenate Videos"):
-            final_clip = concatenate_videoclips(clips)
             filename = f"Concat_{datetime.now().strftime('%H%M%S')}.mp4"
-            st.session_state.concat_output = filename
-            final_clip.write_videofile(filename, codec=codec, audio_codec=audio_codec, logger=sl.StreamlitLogger(int(final_clip.fps*final_clip.duration)))
-            st.success("✅ Concatenation Completed!")
-            st.video(filename)
-            with open(filename, "rb") as f:
-                st.download_button("Download", f, file_name=filename)
-            uf.close_and_remove(final_clip, *clips)
+            # Matching inputs are joined with the concat demuxer, no re-encode
+            start_job("concatenate", TOOLS[option], filename, paths=paths)
+    show_job(TOOLS[option], "✅ Concatenation Completed!")
 
 def add_background_music_ui():
     video_file = st.file_uploader("Upload Video", type=["mp4","mov","avi"], key=st.session_state.video_key_bg)
@@ -186,24 +354,19 @@ def add_background_music_ui():
     if video_file and audio_file:
         video_path = uf.save_temp_file(video_file, ".mp4")
         audio_path = uf.save_temp_file(audio_file, ".mp3")
-        video, audio = load_clips(video_path, audio_path)
-        st.success(f"🎥 {video_file.name} | 🎵 {audio_file.name} | {video.duration:.2f}s")
+        video_duration, _ = load_durations(video_path, audio_path)
+        st.success(f"🎥 {video_file.name} | 🎵 {audio_file.name} | {video_duration:.2f}s")
         orig_vol = st.slider("Original Voice Volume", 0.0, 1.0, 1.0)
         music_vol = st.slider("Background Music Volume", 0.0, 1.0, 0.5)
+        duck_db = st.slider("Duck Music Under Voice (dB)", 0, 24, 0, help="Lowers the music while the original audio is loud")
+        limiter = st.checkbox("Limiter", value=True, help="Keeps the mix from clipping")
+        loop = st.checkbox("Loop Music", value=True, help="Repeats shorter music with a crossfade to fill the video")
 
         if st.button("Merge Now"):
-            video_audio = video.audio.with_volume_scaled(orig_vol) if video.audio else None
-            cut_music = audio.subclipped(0, min(audio.duration, video.duration)).with_volume_scaled(music_vol)
-            final_audio = CompositeAudioClip([video_audio, cut_music]) if video_audio else cut_music
-            output_video = video.with_audio(final_audio)
             filename = f"Merged__{datetime.now().strftime('%H%M%S')}.mp4"
-            st.session_state.bg_output = filename
-            output_video.write_videofile(filename, codec=codec, audio_codec=audio_codec, logger=sl.StreamlitLogger(int(output_video.fps*output_video.duration)))
-            st.success("✅ Merge Completed!")
-            st.video(filename)
-            with open(filename, "rb") as f:
-                st.download_button("Download", f, file_name=filename)
-            uf.close_and_remove(output_video, video, audio)
+            start_job("add_background_music", TOOLS[option], filename, video_path=video_path, audio_path=audio_path,
+                      orig_vol=orig_vol, music_vol=music_vol, duck_db=float(duck_db), limiter=limiter, loop=loop)
+    show_job(TOOLS[option], "✅ Merge Completed!")
 
 # ==============================
 # Tool Dispatcher
@@ -215,7 +378,10 @@ tool_dispatch = {
     "Add Background Music": add_background_music_ui
 }
 
-tool_dispatch[option]()
+try:
+    tool_dispatch[option]()
+except AdmissionError as e:
+    st.warning(f"⏳ {e}")
 
 # ==============================
 # Remove Uploaded Files Button
@@ -229,4 +395,7 @@ st.write("---")
 year = datetime.now().year
 _, col, _ = st.columns([4, 2.5, 4])  # empty, center, empty
 with col:
-    st.caption(f"© {year} All rights reserved.")
\ No newline at end of file
+    st.caption(f"© {year} All rights reserved.")
+
+# Per-rerun latency (script start to end), tracked next to the render stages
+metrics.record("rerun", time.perf_counter() - RUN_STARTED, tool=option)
\ No newline at end of file
@@ -0,0 +1,208 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import ffmpeg_utils as ff
+import upload_cache as uc
+
+# ==============================
+# Settings
+# ==============================
+# Both tracks are decoded once to float32 PCM; gain, ducking, summation and limiting run as
+# vectorized NumPy operations over fixed-size blocks, and the mix is piped straight to the encoder.
+SAMPLE_RATE = 48000
+CHANNELS = 2
+BLOCK_FRAMES = int(os.environ.get("AUDIO_BLOCK_FRAMES", 1 << 16))
+# Decoded tracks larger than this are memory-mapped instead of loaded
+MEMMAP_BYTES = int(os.environ.get("AUDIO_MEMMAP_BYTES", 64 * 1024 ** 2))
+ENVELOPE_BLOCK = 2048
+DUCK_THRESHOLD_DB = -35.0
+DUCK_KNEE_DB = 6.0
+LIMIT_CEILING = 0.98
+LIMIT_LOOKAHEAD = 0.005  # seconds the limiter sees ahead; the mix is delayed by this much and realigned
+LIMIT_RELEASE_DB = 60.0  # dB per second the gain recovers once a peak has passed
+# Music shorter than the video is looped, each repeat overlapping the previous one by this much
+CROSSFADE_SECONDS = float(os.environ.get("MUSIC_CROSSFADE", 2.0))
+ENVELOPE_SUFFIX = ".envelope.npy"
+
+# ==============================
+# Decoding
+# ==============================
+def load_pcm(raw_path, channels=CHANNELS):
+    frames = os.path.getsize(raw_path) // (4 * channels)
+    if frames == 0:
+        return np.zeros((0, channels), dtype=np.float32)
+    if frames * 4 * channels > MEMMAP_BYTES:
+        return np.memmap(raw_path, dtype=np.float32, mode="r", shape=(frames, channels))
+    return np.fromfile(raw_path, dtype=np.float32, count=frames * channels).reshape(frames, channels)
+
+
+def decode(path, raw_path, duration=None, rate=SAMPLE_RATE, channels=CHANNELS):
+    limit = ["-t", f"{duration:.6f}"] if duration else []
+    ff.run_ffmpeg(["-i", path, *limit, "-vn", "-map", "0:a:0", "-ac", str(channels), "-ar", str(rate),
+                   "-f", "f32le", raw_path], track=False)
+    return load_pcm(raw_path, channels)
+
+# ==============================
+# Loudness & Gain
+# ==============================
+def loudness_envelope(pcm, block=ENVELOPE_BLOCK):
+    # RMS level in dBFS per `block` frames, computed BLOCK_FRAMES at a time to bound memory
+    count = -(-len(pcm) // block)
+    envelope = np.full(count, -120.0)
+    step = max(BLOCK_FRAMES // block, 1)
+    for first in range(0, count, step):
+        chunk = np.asarray(pcm[first * block:(first + step) * block], dtype=np.float32)
+        n = -(-len(chunk) // block)
+        padded = np.zeros((n * block, chunk.shape[1]), dtype=np.float32)
+        padded[:len(chunk)] = chunk
+        rms = np.sqrt(np.mean(np.square(padded.reshape(n, -1)), axis=1))
+        envelope[first:first + n] = 20 * np.log10(np.maximum(rms, 1e-6))
+    return envelope
+
+
+def voice_envelope(video_path, voice):
+    # Cached next to the upload, so changing ducking settings never rescans the original audio
+    envelope_file = uc.derived_path(video_path, ENVELOPE_SUFFIX)
+    try:
+        return np.load(envelope_file)
+    except (OSError, ValueError):
+        pass
+    envelope = loudness_envelope(voice)
+    # Only persist for uploads we own; never write sidecars next to arbitrary files
+    if os.path.dirname(os.path.abspath(video_path)) == os.path.abspath(uc.CACHE_DIR):
+        tmp = f"{envelope_file}.{os.getpid()}.part"
+        with open(tmp, "wb") as f:
+            np.save(f, envelope)
+        os.replace(tmp, envelope_file)
+    return envelope
+
+
+def ducking_gain(envelope, duck_db, threshold_db=DUCK_THRESHOLD_DB, hold=8, smooth=8):
+    # Linear gain per envelope block: full reduction once the voice is DUCK_KNEE_DB over the threshold
+    over = np.clip((envelope - threshold_db) / DUCK_KNEE_DB, 0.0, 1.0)
+    if len(over) >= hold:
+        # Hold the reduction across short pauses so the music doesn't pump between words
+        over = np.lib.stride_tricks.sliding_window_view(np.pad(over, (hold - 1, 0)), hold).max(axis=1)
+    if len(over) >= smooth:
+        over = np.convolve(over, np.ones(smooth) / smooth, mode="same")
+    return np.power(10.0, -duck_db * over / 20.0)
+
+
+def block_gain(gains, first_frame, frames, block=ENVELOPE_BLOCK):
+    # Per-frame gain interpolated between envelope block centres
+    centres = (np.arange(len(gains)) + 0.5) * block
+    positions = np.arange(first_frame, first_frame + frames)
+    return np.interp(positions, centres, gains).astype(np.float32)[:, None]
+
+
+class Limiter:
+    # Sample-accurate look-ahead peak limiter. The gain for each frame is the lowest gain any frame
+    # in the next `lookahead` needs (attack), recovers at release_db per second (release), and is
+    # averaged over `lookahead` frames so it never steps; every averaged value already covers the peak,
+    # so the ceiling holds exactly. Output lags input by `lookahead` frames until flush().
+    def __init__(self, ceiling=LIMIT_CEILING, lookahead=LIMIT_LOOKAHEAD, release_db=LIMIT_RELEASE_DB,
+                 rate=SAMPLE_RATE, channels=CHANNELS):
+        self.ceiling = ceiling
+        self.lookahead = max(int(lookahead * rate), 1)
+        self.release = release_db / rate
+        self.level_db = 0.0
+        self.held = np.zeros((0, channels), dtype=np.float32)
+        self.history = np.ones(self.lookahead)
+
+    def process(self, block):
+        data = np.concatenate([self.held, np.asarray(block, dtype=np.float32)])
+        count = len(data) - self.lookahead
+        if count <= 0:
+            self.held = data
+            return data[:0]
+        peak = np.max(np.abs(data), axis=1)
+        required = 20 * np.log10(np.minimum(1.0, self.ceiling / np.maximum(peak, 1e-12)))
+        window = np.lib.stride_tricks.sliding_window_view(required, self.lookahead + 1).min(axis=1)
+        # gain_db[i] = min(window[i], gain_db[i - 1] + release), as a running minimum
+        ramp = self.release * np.arange(count)
+        gain_db = np.minimum(ramp + np.minimum.accumulate(window - ramp), self.level_db + ramp + self.release)
+        self.level_db = float(gain_db[-1])
+        gain = np.concatenate([self.history, np.power(10.0, gain_db / 20.0)])
+        total = np.concatenate([[0.0], np.cumsum(gain)])
+        smooth = (total[self.lookahead + 1:] - total[:-self.lookahead - 1]) / (self.lookahead + 1)
+        self.history = gain[-self.lookahead:]
+        self.held = data[count:]
+        out = data[:count] * smooth.astype(np.float32)[:, None]
+        # Guards only float rounding; the gain above already keeps every frame under the ceiling
+        return np.clip(out, -self.ceiling, self.ceiling)
+
+    def flush(self):
+        # The frames still held back for look-ahead; silence ahead of them needs no reduction
+        return self.process(np.zeros((self.lookahead, self.held.shape[1]), dtype=np.float32))
+
+# ==============================
+# Looping
+# ==============================
+def crossfade_frames(length, rate=SAMPLE_RATE):
+    return min(int(CROSSFADE_SECONDS * rate), length // 4)
+
+
+def looped(music, first, frames, crossfade):
+    # Frames [first, first + frames) of the music repeated with equal-power crossfades
+    period = len(music) - crossfade
+    positions = np.arange(first, first + frames)
+    offset = positions % period
+    out = np.asarray(music[offset], dtype=np.float32)
+    fading = (offset < crossfade) & (positions >= period)
+    if crossfade and fading.any():
+        x = offset[fading] / crossfade * (np.pi / 2)
+        tail = np.asarray(music[offset[fading] + period], dtype=np.float32)
+        out[fading] = out[fading] * np.sin(x)[:, None] + tail * np.cos(x)[:, None]
+    return out
+
+# ==============================
+# Mixing
+# ==============================
+def mix_blocks(frames, voice, music, orig_vol, music_vol, duck=None, limiter=True, loop=True):
+    # Yields the mix as raw f32le bytes, BLOCK_FRAMES at a time
+    limit = Limiter() if limiter else None
+    loop = loop and 0 < len(music) < frames
+    crossfade = crossfade_frames(len(music)) if loop else 0
+    for first in range(0, frames, BLOCK_FRAMES):
+        n = min(BLOCK_FRAMES, frames - first)
+        out = np.zeros((n, CHANNELS), dtype=np.float32)
+        if voice is not None:
+            part = voice[first:first + n]
+            out[:len(part)] += part * np.float32(orig_vol)
+        part = looped(music, first, n, crossfade) if loop else music[first:first + n]
+        if len(part):
+            scaled = part * np.float32(music_vol)
+            if duck is not None:
+                scaled = scaled * block_gain(duck, first, len(part))
+            out[:len(part)] += scaled
+        if limit:
+            out = limit.process(out)
+        if len(out):
+            yield np.ascontiguousarray(out, dtype="<f4").tobytes()
+    if limit:
+        yield np.ascontiguousarray(limit.flush(), dtype="<f4").tobytes()
+
+
+def mix_background_music(video_path, audio_path, output, orig_vol, music_vol, audio_codec,
+                         duck_db=0.0, limiter=True, loop=True):
+    info = ff.probe(video_path)
+    duration = ff.media_duration(info)
+    has_audio = ff.first_stream(info, "audio") is not None
+    frames = int(round(duration * SAMPLE_RATE))
+    workdir = tempfile.mkdtemp(prefix="video_editor_mix_")
+    try:
+        voice = decode(video_path, os.path.join(workdir, "voice.f32"), duration) if has_audio else None
+        music = decode(audio_path, os.path.join(workdir, "music.f32"), duration)
+        duck = ducking_gain(voice_envelope(video_path, voice), duck_db) if voice is not None and duck_db > 0 else None
+        # Only the audio changes, so the video stream is copied as-is
+        ff.run_ffmpeg([
+            "-i", video_path, "-f", "f32le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "-i", "pipe:0",
+            "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", audio_codec, "-t", f"{duration:.6f}",
+            "-movflags", "+faststart", output,
+        ], feed=mix_blocks(frames, voice, music, orig_vol, music_vol, duck, limiter, loop))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return output
@@ -0,0 +1,144 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# ==============================
+# Manifest
+# ==============================
+# Headless entry point for bulk jobs, e.g.:
+#   python batch_cli.py jobs.json --workers 4 --output-dir out --report report.json
+# Each job is {"tool": ..., <tool arguments>, "output": ...}. Tools and their arguments mirror
+# video_engine: merge_audio, trim, trim_many, concatenate, add_background_music (short aliases below).
+TOOL_ALIASES = {
+    "merge": "merge_audio",
+    "merge_audio": "merge_audio",
+    "trim": "trim",
+    "cuts": "trim_many",
+    "trim_many": "trim_many",
+    "concat": "concatenate",
+    "concatenate": "concatenate",
+    "music": "add_background_music",
+    "add_background_music": "add_background_music",
+}
+INPUT_KEYS = ("video_path", "audio_path")
+
+
+def parse_value(value):
+    if not isinstance(value, str):
+        return value
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    try:
+        return float(value) if any(c in value for c in ".eE") else int(value)
+    except ValueError:
+        return value
+
+
+def load_manifest(path):
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        jobs = []
+        for row in rows:
+            job = {k: parse_value(v) for k, v in row.items() if v not in (None, "")}
+            # CSV can't hold lists: concatenate inputs are ';'-separated
+            if isinstance(job.get("paths"), str):
+                job["paths"] = [p.strip() for p in job["paths"].split(";") if p.strip()]
+            jobs.append(job)
+        return jobs
+    with open(path) as f:
+        data = json.load(f)
+    return data["jobs"] if isinstance(data, dict) else data
+
+# ==============================
+# Worker
+# ==============================
+def run_manifest_job(index, job, output_dir):
+    import ffmpeg_utils as ff
+    import upload_cache as uc
+    import video_engine as ve
+
+    started = time.time()
+    record = {"index": index, "tool": job.get("tool"), "status": "failed", "output": None, "error": None}
+    pinned = []
+    try:
+        tool = TOOL_ALIASES[job["tool"]]
+        kwargs = {k: v for k, v in job.items() if k not in ("tool", "profile")}
+        # draft/standard/archival (encoding_profiles); batch runs have no load policy, so no "auto"
+        ff.set_encoding_profile(job.get("profile"))
+        record["profile"] = job.get("profile")
+        # Inputs go through the shared upload store, so probes and keyframe indexes are reused
+        ingest_started = time.time()
+        # Pinned as they arrive: the store is shared with other workers and the web server, which evict too
+        for key in INPUT_KEYS:
+            if key in kwargs:
+                kwargs[key] = uc.ingest(kwargs[key])
+                pinned += uc.pin([kwargs[key]])
+        if "paths" in kwargs:
+            kwargs["paths"] = [uc.ingest(p) for p in kwargs["paths"]]
+            pinned += uc.pin(kwargs["paths"])
+        record["ingest_seconds"] = round(time.time() - ingest_started, 3)
+
+        # trim_many bundles its clips into a zip
+        output = kwargs.get("output") or f"{tool}_{index:05d}{'.zip' if tool == 'trim_many' else '.mp4'}"
+        kwargs["output"] = output if os.path.isabs(output) else os.path.join(output_dir, output)
+        render_started = time.time()
+        result = getattr(ve, tool)(**kwargs)
+        record["render_seconds"] = round(time.time() - render_started, 3)
+        record.update(status="done", output=kwargs["output"], result=result,
+                      output_bytes=os.path.getsize(kwargs["output"]))
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        uc.unpin(pinned)
+    record["seconds"] = round(time.time() - started, 3)
+    return record
+
+# ==============================
+# Entry Point
+# ==============================
+def run_batch(jobs, workers=1, output_dir="."):
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(max(1, workers)) as pool:
+        futures = [pool.submit(run_manifest_job, i, job, output_dir) for i, job in enumerate(jobs)]
+        for future in as_completed(futures):
+            record = future.result()
+            results.append(record)
+            print(f"[{record['status']}] job {record['index']} ({record['tool']}) in {record['seconds']}s",
+                  file=sys.stderr)
+    return sorted(results, key=lambda r: r["index"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run video editing jobs from a JSON/CSV manifest.")
+    parser.add_argument("manifest", help="JSON list (or {'jobs': [...]}) or CSV with one job per row")
+    parser.add_argument("-w", "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("-o", "--output-dir", default=".")
+    parser.add_argument("-r", "--report", help="write the JSON results report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    results = run_batch(load_manifest(args.manifest), args.workers, args.output_dir)
+    report = {
+        "manifest": args.manifest,
+        "workers": args.workers,
+        "seconds": round(time.time() - started, 3),
+        "done": sum(r["status"] == "done" for r in results),
+        "failed": sum(r["status"] != "done" for r in results),
+        "jobs": results,
+    }
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import os
+
+from resource_governor import MAX_RENDERS
+
+# ==============================
+# Profiles
+# ==============================
+# Named bundles of encoder settings. "auto" picks one per job from the server load at submit time:
+# faster presets when the render queue is deep or the CPU is saturated, higher efficiency when idle.
+PROFILE_NAMES = ["auto", "draft", "standard", "archival"]
+PROFILES = {
+    "draft": {
+        "pix_fmt": "yuv420p", "threads": "shared",
+        "libx264": ["-preset", "veryfast", "-crf", "28"],
+        "mpeg4": ["-q:v", "8"],
+        "libvpx": ["-deadline", "realtime", "-cpu-used", "8", "-b:v", "1M", "-crf", "30"],
+    },
+    "standard": {
+        "pix_fmt": "yuv420p", "threads": "shared",
+        "libx264": ["-preset", "medium", "-crf", "23"],
+        "mpeg4": ["-q:v", "4"],
+        "libvpx": ["-deadline", "good", "-cpu-used", "4", "-b:v", "2M", "-crf", "10"],
+    },
+    "archival": {
+        "pix_fmt": "yuv420p", "threads": "all",
+        "libx264": ["-preset", "slow", "-crf", "18"],
+        "mpeg4": ["-q:v", "2"],
+        "libvpx": ["-deadline", "good", "-cpu-used", "1", "-b:v", "4M", "-crf", "4"],
+    },
+}
+DEFAULT_PROFILE = "standard"
+
+# ==============================
+# Load Policy
+# ==============================
+DRAFT_QUEUE_DEPTH = int(os.environ.get("DRAFT_QUEUE_DEPTH", 2))
+DRAFT_CPU_LOAD = float(os.environ.get("DRAFT_CPU_LOAD", 0.9))
+IDLE_CPU_LOAD = float(os.environ.get("IDLE_CPU_LOAD", 0.25))
+
+
+def cpu_load():
+    # 1-minute load average per core; None where the OS doesn't report one (Windows)
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def choose_profile(requested, utilisation, load=None):
+    # utilisation: resource_governor.governor.utilisation()
+    if requested in PROFILES:
+        return requested
+    load = cpu_load() if load is None else load
+    queued, running = utilisation["renders_queued"], utilisation["renders_running"]
+    if queued >= DRAFT_QUEUE_DEPTH or (load is not None and load >= DRAFT_CPU_LOAD):
+        return "draft"
+    if queued == 0 and running == 0 and (load is None or load < IDLE_CPU_LOAD):
+        return "archival"
+    return DEFAULT_PROFILE
+
+# ==============================
+# Encoder Arguments
+# ==============================
+def thread_count(profile):
+    # "shared" splits the cores between concurrent renders; "all" (0 = encoder default) uses them all
+    if PROFILES[profile]["threads"] == "all":
+        return 0
+    return max(1, (os.cpu_count() or 1) // MAX_RENDERS)
+
+
+def ffmpeg_args(profile, codec, threads=True, pix_fmt=True):
+    # pix_fmt=False: rate control and preset only, for encodes whose output format is locked elsewhere
+    settings = PROFILES.get(profile)
+    if not settings or codec not in settings:
+        return []
+    args = [*settings[codec]]
+    if pix_fmt:
+        args += ["-pix_fmt", settings["pix_fmt"]]
+    if threads:
+        args += ["-threads", str(thread_count(profile))]
+    return args
+
+
+def moviepy_options(profile, codec):
+    # write_videofile keywords; the encoder settings travel as extra ffmpeg parameters
+    settings = PROFILES.get(profile)
+    if not settings:
+        return {}
+    return {
+        "threads": thread_count(profile) or None,
+        "ffmpeg_params": ffmpeg_args(profile, codec, threads=False),
+    }
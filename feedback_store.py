@@ -0,0 +1,110 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+
+# ==============================
+# Settings
+# ==============================
+# One row per email in SQLite (WAL mode): a submission is a single indexed upsert, concurrent
+# sessions never overwrite each other, and reads page through the newest rows.
+DB_PATH = os.environ.get("FEEDBACK_DB", "feedback.db")
+CSV_PATH = os.environ.get("FEEDBACK_CSV", "feedback.csv")
+PAGE_SIZE = 20
+BUSY_TIMEOUT = 30.0
+SCHEMA_VERSION = 1  # PRAGMA user_version; also marks the one-time CSV import as done
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialised = set()
+
+# ==============================
+# Connection & Schema
+# ==============================
+def connect(path=DB_PATH):
+    # sqlite3 connections are per thread; Streamlit runs each session's script in its own thread
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    if path not in connections:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        init(conn, path)
+        connections[path] = conn
+    return connections[path]
+
+
+def init(conn, path=DB_PATH, csv_path=CSV_PATH):
+    # Held until the schema is committed: no thread of this process uses the table before it exists
+    with _init_lock:
+        if path in _initialised:
+            return
+        conn.execute("PRAGMA journal_mode=WAL")
+        # BEGIN IMMEDIATE: only one process creates the schema and imports the CSV
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS feedback (
+                        id INTEGER PRIMARY KEY,
+                        email TEXT NOT NULL UNIQUE,
+                        name TEXT NOT NULL,
+                        message TEXT NOT NULL,
+                        created REAL NOT NULL,
+                        updated REAL NOT NULL
+                    )""")
+                conn.execute("CREATE INDEX IF NOT EXISTS feedback_updated ON feedback (updated DESC, id DESC)")
+                import_csv(conn, csv_path)
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        _initialised.add(path)
+
+
+def import_csv(conn, csv_path):
+    # One-time migration of the old feedback.csv; rows keep their file order as their recency
+    if not os.path.exists(csv_path):
+        return 0
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = [r for r in csv.DictReader(f) if (r.get("email") or "").strip()]
+    now = time.time() - len(rows)
+    for i, row in enumerate(rows):
+        upsert(row.get("name") or "", row["email"], row.get("message") or "", conn=conn, now=now + i)
+    return len(rows)
+
+# ==============================
+# Writes & Reads
+# ==============================
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def upsert(name, email, message, conn=None, now=None):
+    # A newer message from the same email replaces the older one
+    now = time.time() if now is None else now
+    (conn or connect()).execute("""
+        INSERT INTO feedback (email, name, message, created, updated) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(email) DO UPDATE SET name=excluded.name, message=excluded.message, updated=excluded.updated
+    """, (normalize_email(email), name.strip(), message.strip(), now, now))
+
+
+def latest(limit=PAGE_SIZE, cursor=None):
+    # Keyset pagination: cursor is the (updated, id) of the last row of the previous page
+    conn = connect()
+    if cursor:
+        rows = conn.execute(
+            "SELECT * FROM feedback WHERE (updated, id) < (?, ?) ORDER BY updated DESC, id DESC LIMIT ?",
+            (*cursor, limit + 1)).fetchall()
+    else:
+        rows = conn.execute("SELECT * FROM feedback ORDER BY updated DESC, id DESC LIMIT ?", (limit + 1,)).fetchall()
+    page = [dict(r) for r in rows[:limit]]
+    next_cursor = (page[-1]["updated"], page[-1]["id"]) if len(rows) > limit else None
+    return page, next_cursor
+
+
+def count():
+    return connect().execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
@@ -0,0 +1,438 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ==============================
+# ffmpeg / ffprobe Binaries
+# ==============================
+class FFmpegError(RuntimeError):
+    pass
+
+
+def ffmpeg_bin():
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+def ffprobe_bin():
+    # imageio-ffmpeg only ships ffmpeg, so ffprobe must come from the system (packages.txt)
+    return shutil.which("ffprobe")
+
+
+# ==============================
+# Encoding Profile
+# ==============================
+# Like the progress callback, set once per job in its worker process (encoding_profiles.PROFILES)
+_encoding_profile = None
+
+
+def set_encoding_profile(profile):
+    global _encoding_profile
+    _encoding_profile = profile
+
+
+def video_args(codec, threads=True, pix_fmt=True):
+    import encoding_profiles
+
+    return encoding_profiles.ffmpeg_args(_encoding_profile, codec, threads, pix_fmt) if _encoding_profile else []
+
+
+def moviepy_options(codec):
+    import encoding_profiles
+
+    return encoding_profiles.moviepy_options(_encoding_profile, codec) if _encoding_profile else {}
+
+# ==============================
+# Progress Reporting
+# ==============================
+# A render job installs a callback(process_key, seconds_written) for its worker process.
+# Parallel/sequential steps report under their own key, so the job can sum them.
+_progress_callback = None
+
+
+def set_progress_callback(callback):
+    global _progress_callback
+    _progress_callback = callback
+
+
+def read_progress(stream, key, callback):
+    for line in stream:
+        name, _, value = line.strip().partition("=")
+        # out_time_ms is (despite its name) in microseconds, like out_time_us
+        if name in ("out_time_us", "out_time_ms") and value.isdigit():
+            callback(key, int(value) / 1_000_000)
+
+
+def feed_stdin(stdin, chunks, errors):
+    # Raw media (e.g. mixed PCM) is written straight into ffmpeg's stdin instead of a temp file
+    try:
+        for chunk in chunks:
+            stdin.write(chunk)
+    except (BrokenPipeError, OSError):
+        pass
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+
+def wait_with_usage(proc):
+    # os.wait4 returns this ffmpeg's own rusage, which the job's metrics span adds to its CPU and peak RSS
+    if not hasattr(os, "wait4"):
+        return proc.wait()
+    import metrics
+
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        return proc.wait()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    metrics.add_child_usage(usage.ru_utime + usage.ru_stime, usage.ru_maxrss * 1024)
+    return proc.returncode
+
+
+def run_ffmpeg(args, track=True, feed=None):
+    # track=False for steps that re-read the whole timeline (joins, final muxes) so progress isn't counted twice
+    # feed: iterable of bytes for an input given as "pipe:0"
+    callback = _progress_callback if track else None
+    cmd = [ffmpeg_bin(), "-hide_banner", "-loglevel", "error", "-y"]
+    if feed is None:
+        cmd.append("-nostdin")
+    if callback:
+        cmd += ["-progress", "pipe:1", "-nostats"]
+    try:
+        proc = subprocess.Popen([*cmd, *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                stdin=subprocess.PIPE if feed is not None else None)
+    except OSError as e:
+        raise FFmpegError(str(e)) from e
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+    reader.start()
+    writer, feed_errors = None, []
+    if feed is not None:
+        writer = threading.Thread(target=feed_stdin, args=(proc.stdin.buffer, feed, feed_errors), daemon=True)
+        writer.start()
+    if callback:
+        read_progress(proc.stdout, object(), callback)
+    else:
+        proc.stdout.read()
+    wait_with_usage(proc)
+    reader.join()
+    if writer:
+        writer.join()
+    if feed_errors:
+        # ffmpeg saw a clean EOF, so its output is truncated rather than failed
+        raise feed_errors[0]
+    if proc.returncode != 0:
+        raise FFmpegError("".join(stderr).strip() or f"ffmpeg exited with code {proc.returncode}")
+    return proc
+
+
+def probe(path):
+    ffprobe = ffprobe_bin()
+    if not ffprobe:
+        raise FFmpegError("ffprobe not found")
+    cmd = [ffprobe, "-v", "error", "-show_streams", "-show_format", "-of", "json", path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise FFmpegError(result.stderr.strip() or f"ffprobe failed on {path}")
+    return json.loads(result.stdout)
+
+# ==============================
+# Stream Compatibility
+# ==============================
+# Parameters that must be identical for the concat demuxer to join files with -c copy
+STREAM_KEYS = {
+    "video": ("codec_name", "profile", "width", "height", "pix_fmt", "sample_aspect_ratio", "r_frame_rate"),
+    "audio": ("codec_name", "profile", "sample_rate", "channels", "channel_layout"),
+}
+
+
+def stream_signature(info):
+    signature = []
+    for stream in info.get("streams", []):
+        kind = stream.get("codec_type")
+        if kind in STREAM_KEYS:
+            signature.append((kind,) + tuple(stream.get(k) for k in STREAM_KEYS[kind]))
+    return tuple(signature)
+
+
+def can_concat_copy(paths):
+    if len(paths) < 2:
+        return False
+    try:
+        signatures = [stream_signature(probe(p)) for p in paths]
+    except (FFmpegError, ValueError):
+        return False
+    return bool(signatures[0]) and all(s == signatures[0] for s in signatures)
+
+# ==============================
+# Concat Demuxer
+# ==============================
+def write_concat_list(paths, workdir=None):
+    tmp = tempfile.NamedTemporaryFile("w", delete=False, suffix=".txt", dir=workdir)
+    for path in paths:
+        escaped = os.path.abspath(path).replace("'", "'\\''")
+        tmp.write(f"file '{escaped}'\n")
+    tmp.close()
+    return tmp.name
+
+
+def join_segments(paths, output):
+    list_file = write_concat_list(paths)
+    try:
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_file, "-c", "copy", output], track=False)
+    finally:
+        os.remove(list_file)
+    return output
+
+
+def concat_copy(paths, output):
+    list_file = write_concat_list(paths)
+    try:
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", list_file,
+            "-map", "0:v", "-map", "0:a?", "-c", "copy",
+            "-movflags", "+faststart", output,
+        ])
+    finally:
+        os.remove(list_file)
+    return output
+
+# ==============================
+# Keyframe-aware Trimming
+# ==============================
+# Source codec -> (encoder producing a compatible bitstream, segment container)
+SMART_RENDER_CODECS = {
+    "h264": ("libx264", ".ts"),
+    "hevc": ("libx265", ".ts"),
+    "mpeg4": ("mpeg4", ".ts"),
+    "vp8": ("libvpx", ".mkv"),
+    "vp9": ("libvpx-vp9", ".mkv"),
+}
+# ffprobe profile names -> encoder -profile:v values
+X264_PROFILES = {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high"}
+X265_PROFILES = {"Main": "main", "Main 10": "main10", "Main Still Picture": "mainstillpicture"}
+# ffprobe colour fields -> encoder options; "unknown"/absent values are left to the encoder
+COLOR_OPTIONS = {"color_primaries": "-color_primaries", "color_transfer": "-color_trc",
+                 "color_space": "-colorspace", "color_range": "-color_range"}
+
+
+def first_stream(info, kind):
+    return next((s for s in info.get("streams", []) if s.get("codec_type") == kind), None)
+
+
+def packet_times(path):
+    ffprobe = ffprobe_bin()
+    if not ffprobe:
+        raise FFmpegError("ffprobe not found")
+    # Packet scan: reads flags only, nothing is decoded
+    cmd = [ffprobe, "-v", "error", "-select_streams", "v:0",
+           "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise FFmpegError(result.stderr.strip() or f"ffprobe failed on {path}")
+    packets, keyframes = [], []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        if pts in ("", "N/A"):
+            continue
+        packets.append(float(pts))
+        if "K" in flags:
+            keyframes.append(float(pts))
+    return sorted(packets), sorted(keyframes)
+
+
+def keyframe_times(path):
+    return packet_times(path)[1]
+
+
+def snap_trim(path, start, end, output, keyframes=None):
+    keyframes = keyframe_times(path) if keyframes is None else keyframes
+    snapped = max((k for k in keyframes if k <= start), default=0.0)
+    run_ffmpeg([
+        "-ss", f"{snapped:.6f}", "-i", path, "-t", f"{end - snapped:.6f}",
+        "-map", "0:v:0", "-map", "0:a?", "-c", "copy",
+        "-avoid_negative_ts", "make_zero", "-movflags", "+faststart", output,
+    ])
+    return snapped
+
+
+def profile_args(video, encoder):
+    # Profile and level of the source stream, so re-encoded parts decode with the same parameter sets
+    profile, level = video.get("profile"), video.get("level")
+    level = level if isinstance(level, int) and level > 0 else None
+    if encoder == "libx264":
+        args = ["-profile:v", X264_PROFILES[profile]] if profile in X264_PROFILES else []
+        return args + (["-level", f"{level / 10:.1f}"] if level else [])
+    if encoder == "libx265":
+        args = ["-profile:v", X265_PROFILES[profile]] if profile in X265_PROFILES else []
+        return args + (["-x265-params", f"level-idc={level / 30:.1f}"] if level else [])
+    if encoder == "libvpx-vp9" and (profile or "").startswith("Profile "):
+        return ["-profile:v", profile.split()[-1]]
+    return []
+
+
+def bitstream_args(video, encoder):
+    # Everything the re-encoded GOP edges must share with the stream-copied middle to splice cleanly
+    args = ["-pix_fmt", video["pix_fmt"]] if video.get("pix_fmt") else []
+    args += profile_args(video, encoder)
+    if video.get("time_base"):
+        args += ["-enc_time_base:v", video["time_base"]]
+    for field, option in COLOR_OPTIONS.items():
+        if video.get(field) and video[field] != "unknown":
+            args += [option, video[field]]
+    return args
+
+
+def encode_range(path, start, duration, output, codec, audio_codec=None, extra=()):
+    audio = ["-map", "0:a?", "-c:a", audio_codec] if audio_codec else ["-an"]
+    run_ffmpeg([
+        "-ss", f"{start:.6f}", "-i", path, "-t", f"{duration:.6f}",
+        "-map", "0:v:0", *audio, "-c:v", codec, *extra, output,
+    ])
+    return output
+
+
+def copy_gops(path, first_key, last_key, previous_key, workdir, ext):
+    # Stream-copies the whole GOPs in [first_key, last_key). -t stops on DTS, so with B-frames it also
+    # lets through last_key's keyframe and the P-frame decoded after it; the segment muxer splits
+    # at that keyframe (between the two last keyframes, so small timestamp offsets can't move the cut)
+    # and only the first segment is kept.
+    split = (previous_key + last_key) / 2 - first_key
+    run_ffmpeg([
+        "-ss", f"{first_key:.6f}", "-i", path, "-t", f"{last_key - first_key:.6f}",
+        "-map", "0:v:0", "-an", "-c", "copy",
+        "-f", "segment", "-segment_format", "mpegts" if ext == ".ts" else "matroska",
+        "-segment_times", f"{split:.6f}", os.path.join(workdir, f"middle%03d{ext}"),
+    ])
+    return os.path.join(workdir, f"middle000{ext}")
+
+
+def smart_trim(path, start, end, output, codec="libx264", audio_codec="aac", keyframes=None, packets=None):
+    # keyframes/packets: from keyframe_index when the caller has them, otherwise one packet scan here
+    info = probe(path)
+    video = first_stream(info, "video")
+    has_audio = first_stream(info, "audio") is not None
+    smart = SMART_RENDER_CODECS.get(video.get("codec_name")) if video else None
+    if smart and (keyframes is None or packets is None):
+        packets, keyframes = packet_times(path)
+    keyframes = keyframes or []
+    inner = [k for k in keyframes if start <= k <= end]
+
+    # No full GOP inside the range (or no compatible encoder): plain re-encode
+    if not smart or len(inner) < 2:
+        encode_range(path, start, end - start, output, codec, audio_codec if has_audio else None,
+                     [*video_args(codec), "-movflags", "+faststart"])
+        return output
+
+    encoder, ext = smart
+    first_key, last_key = inner[0], inner[-1]
+    extra = bitstream_args(video, encoder)
+    workdir = tempfile.mkdtemp(prefix="video_editor_trim_")
+    try:
+        segments = []
+        if first_key > start:
+            segments.append(encode_range(path, start, first_key - start,
+                                         os.path.join(workdir, f"head{ext}"), encoder, extra=extra))
+        middle = copy_gops(path, first_key, last_key, inner[-2], workdir, ext)
+        # A frame too many or too few here would shift everything after the splice
+        expected = sum(first_key - 1e-3 <= p < last_key - 1e-3 for p in packets)
+        copied = len(packet_times(middle)[0])
+        if copied != expected:
+            raise FFmpegError(f"Copied {copied} frames between keyframes, expected {expected}")
+        segments.append(middle)
+        if end > last_key:
+            segments.append(encode_range(path, last_key, end - last_key,
+                                         os.path.join(workdir, f"tail{ext}"), encoder, extra=extra))
+
+        video_only = join_segments(segments, os.path.join(workdir, f"video{ext}"))
+        # Audio is cheap to encode, so it is cut once over the whole range to avoid seams
+        mux_with_audio(video_only, path if has_audio else None, output, audio_codec, start, end - start)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return output
+
+# ==============================
+# Audio Muxing
+# ==============================
+# Audio codecs the mp4 muxer accepts without re-encoding
+MP4_AUDIO_CODECS = {"aac", "mp3", "alac", "ac3", "opus"}
+
+
+def media_duration(info):
+    try:
+        return float(info["format"]["duration"])
+    except (KeyError, TypeError, ValueError):
+        video = first_stream(info, "video") or {}
+        return float(video.get("duration", 0.0))
+
+
+def mux_audio(video_path, audio_path, output, audio_codec="aac"):
+    duration = media_duration(probe(video_path))
+    audio = first_stream(probe(audio_path), "audio")
+    if audio is None:
+        raise FFmpegError(f"No audio stream in {audio_path}")
+    copy_audio = audio.get("codec_name") in MP4_AUDIO_CODECS
+    run_ffmpeg([
+        "-i", video_path, "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy", "-c:a", "copy" if copy_audio else audio_codec,
+        "-t", f"{duration:.6f}", "-movflags", "+faststart", output,
+    ])
+    return output
+
+
+def mux_with_audio(video_only, audio_source, output, audio_codec, start=0.0, duration=None):
+    args, maps = ["-i", video_only], ["-map", "0:v:0"]
+    if audio_source:
+        limit = ["-t", f"{duration:.6f}"] if duration else []
+        args += ["-ss", f"{start:.6f}", *limit, "-i", audio_source]
+        maps += ["-map", "1:a:0", "-c:a", audio_codec]
+    run_ffmpeg([*args, *maps, "-c:v", "copy", "-movflags", "+faststart", output], track=False)
+    return output
+
+# ==============================
+# Segmented Parallel Encoding
+# ==============================
+def split_ranges(keyframes, start, end, segments):
+    # Evenly spaced cut points, each moved to the nearest keyframe so every segment seeks cheaply
+    step = (end - start) / max(segments, 1)
+    candidates = [k for k in keyframes if start < k < end]
+    points = {start, end}
+    for i in range(1, segments):
+        target = start + i * step
+        if candidates:
+            points.add(min(candidates, key=lambda k: abs(k - target)))
+        else:
+            points.add(target)
+    points = sorted(points)
+    return list(zip(points[:-1], points[1:]))
+
+
+def encode_segments(pieces, workdir, codec, extra=()):
+    # pieces: [(path, start, end)]. Each is encoded by its own ffmpeg process; the threads only wait on them
+    threads = max(1, (os.cpu_count() or 1) // max(len(pieces), 1))
+    outputs = [os.path.join(workdir, f"seg{i:04d}.mkv") for i in range(len(pieces))]
+    with ThreadPoolExecutor(max(len(pieces), 1)) as pool:
+        futures = [
+            pool.submit(encode_range, path, start, end - start, out, codec,
+                        extra=[*extra, *video_args(codec, threads=False), "-threads", str(threads)])
+            for (path, start, end), out in zip(pieces, outputs)
+        ]
+        for future in futures:
+            future.result()
+    return outputs
@@ -0,0 +1,91 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+# ==============================
+# Settings
+# ==============================
+# Cold-start import budget for the Streamlit pages, e.g.:
+#   python import_profile.py --budget-ms 1500 --top 15
+# Every module the pages import is loaded once in a fresh interpreter under `-X importtime`;
+# exceeding the budget exits non-zero, so a heavy top-level import is caught before it ships.
+PAGES = ["Home.py"] + sorted(os.path.join("pages", p) for p in os.listdir("pages") if p.endswith(".py")) \
+    if os.path.isdir("pages") else ["Home.py"]
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 1500))
+
+# ==============================
+# Profiling
+# ==============================
+def page_imports(paths):
+    # Top-level imports only: imports inside functions are the lazy ones this budget protects
+    modules = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            modules += [n for n in names if n not in modules]
+    return modules
+
+
+def profile(modules):
+    code = "\n".join(f"import {m}" for m in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    timings = {}
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nesting is shown as two spaces per level after the separator's own space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        timings[name.strip()] = {"self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000,
+                                 "depth": depth}
+    return timings
+
+# ==============================
+# Entry Point
+# ==============================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the cold-start imports of the Streamlit pages.")
+    parser.add_argument("pages", nargs="*", default=PAGES)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="heaviest modules to list")
+    parser.add_argument("--json", action="store_true", help="print the full profile as JSON")
+    args = parser.parse_args(argv)
+
+    modules = page_imports(args.pages)
+    timings = profile(modules)
+    # Only the outermost entries add up to the interpreter's total import time
+    total_ms = sum(t["cumulative_ms"] for t in timings.values() if t["depth"] == 0)
+    report = {
+        "total_ms": round(total_ms, 1),
+        "budget_ms": args.budget_ms,
+        "pages": {m: timings.get(m, {}).get("cumulative_ms") for m in modules},
+        "heaviest": sorted(({"module": n, **t} for n, t in timings.items()),
+                           key=lambda t: t["self_ms"], reverse=True)[:args.top],
+    }
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        print(f"Cold import: {report['total_ms']:.0f} ms (budget {args.budget_ms:.0f} ms)")
+        for module, ms in sorted(report["pages"].items(), key=lambda kv: -(kv[1] or 0)):
+            print(f"  {ms or 0:8.1f} ms  {module}")
+        print("Heaviest modules (self time):")
+        for t in report["heaviest"]:
+            print(f"  {t['self_ms']:8.1f} ms  {t['module']}")
+    return 1 if total_ms > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
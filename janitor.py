@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import render_cache
+import render_jobs as rj
+import upload_cache as uc
+
+# ==============================
+# Settings
+# ==============================
+# A background thread keeps disk use bounded between requests: render-cache TTL and byte quota,
+# upload LRU, finished job directories nobody references, and files left behind by killed processes.
+JANITOR_INTERVAL = float(os.environ.get("JANITOR_INTERVAL", 300))
+JOB_TTL = float(os.environ.get("JOB_TTL", render_cache.CACHE_TTL))
+ORPHAN_GRACE = float(os.environ.get("ORPHAN_GRACE", 3600))
+# Scratch directories the engine creates under the system temp dir (tempfile.mkdtemp prefix)
+WORKDIR_PREFIX = "video_editor_"
+
+_thread = None
+_lock = threading.Lock()
+stats = {"runs": 0, "jobs_removed": 0, "orphans_removed": 0, "last_run": None}
+
+# ==============================
+# Sweeps
+# ==============================
+def age(path, now):
+    # Directories are as young as their newest file: ffmpeg writing a segment only bumps that file's mtime
+    try:
+        newest = os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            for name in dirs + files:
+                try:
+                    newest = max(newest, os.stat(os.path.join(root, name)).st_mtime)
+                except OSError:
+                    continue
+    return now - newest
+
+
+def remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+    return True
+
+
+def sweep_jobs(now):
+    # Cached renders are owned by the render cache; everything else finished expires after JOB_TTL
+    if not os.path.isdir(rj.JOBS_DIR):
+        return 0
+    owned = render_cache.job_ids()
+    removed = 0
+    for job_id in os.listdir(rj.JOBS_DIR):
+        path = rj.job_dir(job_id)
+        if not os.path.isdir(path) or job_id in owned:
+            continue
+        job = rj.read_job(job_id)
+        if job and job["status"] in rj.ACTIVE_STATUSES:
+            continue
+        finished = (job or {}).get("finished") or now - age(path, now)
+        if now - finished >= JOB_TTL:
+            removed += remove(path)
+    return removed
+
+
+def sweep_orphans(now):
+    # Partial spools/copies and engine scratch dirs whose writer died (nothing inside touched for ORPHAN_GRACE)
+    candidates = []
+    if os.path.isdir(uc.CACHE_DIR):
+        candidates += [os.path.join(uc.CACHE_DIR, n) for n in os.listdir(uc.CACHE_DIR) if n.endswith(".part")]
+    tmp = tempfile.gettempdir()
+    keep = {os.path.abspath(uc.CACHE_DIR), os.path.abspath(rj.JOBS_DIR)}
+    candidates += [p for p in (os.path.join(tmp, n) for n in os.listdir(tmp) if n.startswith(WORKDIR_PREFIX))
+                   if os.path.isdir(p) and os.path.abspath(p) not in keep]
+    return sum(remove(p) for p in candidates if age(p, now) >= ORPHAN_GRACE)
+
+
+def run_once():
+    now = time.time()
+    render_cache.sweep(rj.is_active)
+    if os.path.isdir(uc.CACHE_DIR):
+        uc.evict()
+    jobs, orphans = sweep_jobs(now), sweep_orphans(now)
+    with _lock:
+        stats["runs"] += 1
+        stats["jobs_removed"] += jobs
+        stats["orphans_removed"] += orphans
+        stats["last_run"] = now
+    return jobs, orphans
+
+# ==============================
+# Background Thread
+# ==============================
+def loop():
+    while True:
+        try:
+            run_once()
+        except Exception:
+            pass  # a failed sweep is retried next interval; it must never kill the thread
+        time.sleep(JANITOR_INTERVAL)
+
+
+def ensure_janitor():
+    global _thread
+    with _lock:
+        if _thread is None and JANITOR_INTERVAL > 0:
+            _thread = threading.Thread(target=loop, name="janitor", daemon=True)
+            _thread.start()
+        return _thread is not None
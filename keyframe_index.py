@@ -0,0 +1,104 @@
+import bisect
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import ffmpeg_utils as ff
+import upload_cache as uc
+
+# ==============================
+# Settings
+# ==============================
+# Packet timestamps and keyframes from one ffprobe packet scan, persisted next to the upload
+# so cut-point snapping, GOP cost estimates and seeks never rescan the file.
+INDEX_SUFFIX = ".keyframes.json"
+EPSILON = 1e-3
+# Parsed indexes kept in memory, least recently used dropped first; the sidecar reloads them
+MAX_INDEXES = int(os.environ.get("KEYFRAME_INDEX_ENTRIES", 64))
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+# ==============================
+# Build & Load
+# ==============================
+def load_index(path):
+    with _lock:
+        if path in _indexes:
+            _indexes.move_to_end(path)
+            return _indexes[path]
+    index_file = uc.derived_path(path, INDEX_SUFFIX)
+    try:
+        with open(index_file) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        packets, keyframes = ff.packet_times(path)
+        index = {"packets": [round(p, 6) for p in packets], "keyframes": [round(k, 6) for k in keyframes]}
+        # Only persist for uploads we own; never write sidecars next to arbitrary files
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(uc.CACHE_DIR):
+            with open(index_file, "w") as f:
+                json.dump(index, f)
+    with _lock:
+        _indexes[path] = index
+        _indexes.move_to_end(path)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def forget(path):
+    # Called by upload_cache when the upload is evicted
+    with _lock:
+        _indexes.pop(path, None)
+
+
+def keyframes(path):
+    try:
+        return load_index(path)["keyframes"]
+    except ff.FFmpegError:
+        return None
+
+
+def packets(path):
+    try:
+        return load_index(path)["packets"]
+    except ff.FFmpegError:
+        return None
+
+# ==============================
+# Queries
+# ==============================
+def keyframe_before(index, t):
+    kf = index["keyframes"]
+    i = bisect.bisect_right(kf, t + EPSILON) - 1
+    return kf[i] if i >= 0 else 0.0
+
+
+def keyframe_after(index, t):
+    kf = index["keyframes"]
+    i = bisect.bisect_left(kf, t - EPSILON)
+    return kf[i] if i < len(kf) else None
+
+
+def frames_between(index, a, b):
+    packets = index["packets"]
+    return max(0, bisect.bisect_left(packets, b - EPSILON) - bisect.bisect_left(packets, a - EPSILON))
+
+
+def cut_cost(index, start, end):
+    # Mirrors ffmpeg_utils.smart_trim: full GOPs inside [start, end] are copied, the edges re-encoded
+    inner = [k for k in index["keyframes"] if start <= k <= end]
+    if len(inner) < 2:
+        encode, copy = frames_between(index, start, end), 0
+    else:
+        encode = frames_between(index, start, inner[0]) + frames_between(index, inner[-1], end)
+        copy = frames_between(index, inner[0], inner[-1])
+    before = keyframe_before(index, start)
+    return {
+        "encode_frames": encode,
+        "copy_frames": copy,
+        "lead_in_frames": frames_between(index, before, start),
+        "keyframe_before": before,
+        "keyframe_after": keyframe_after(index, start),
+    }
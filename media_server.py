@@ -0,0 +1,172 @@
+import mimetypes
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlparse, parse_qs
+
+import metrics
+from render_jobs import JOBS_DIR
+
+# ==============================
+# Settings
+# ==============================
+# Rendered outputs are streamed straight from disk with HTTP range support, so previews can seek
+# and downloads never pass through the Streamlit websocket or server memory.
+# Opt-in: browsers can only reach the side server through a URL the deployment publishes for it
+# (e.g. an HTTPS reverse proxy path forwarding to MEDIA_HOST:MEDIA_PORT). Without MEDIA_BASE_URL
+# outputs are served in-page by Streamlit.
+MEDIA_BASE_URL = os.environ.get("MEDIA_BASE_URL")
+MEDIA_ENABLED = bool(MEDIA_BASE_URL) and os.environ.get("MEDIA_SERVER", "1") != "0"
+MEDIA_HOST = os.environ.get("MEDIA_HOST", "127.0.0.1")
+MEDIA_PORT = int(os.environ.get("MEDIA_PORT", 8502))
+# Prometheus /metrics has its own listener, loopback by default: it is never exposed with the media files
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 8503))
+CHUNK_SIZE = 1024 * 1024
+PATH_PATTERN = re.compile(r"^/([0-9a-f]{12})/([^/]+)$")
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_server = None
+_metrics_server = None
+_lock = threading.Lock()
+
+# ==============================
+# Request Handler
+# ==============================
+class MediaHandler(BaseHTTPRequestHandler):
+    def resolve(self):
+        url = urlparse(self.path)
+        match = PATH_PATTERN.match(unquote(url.path))
+        if not match or match.group(2) in ("job.json",) or match.group(2).startswith("."):
+            return None, url
+        path = os.path.join(JOBS_DIR, match.group(1), match.group(2))
+        return (path if os.path.isfile(path) else None), url
+
+    def parse_range(self, size):
+        header = self.headers.get("Range")
+        if not header:
+            return None
+        match = RANGE_PATTERN.match(header.strip())
+        if not match or not any(match.groups()):
+            return False
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last) if last else size - 1, size - 1)
+        else:
+            start, end = max(size - int(last), 0), size - 1
+        return (start, end) if start <= end < size else False
+
+    def send_file(self, head_only):
+        path, url = self.resolve()
+        if path is None:
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        byte_range = self.parse_range(size)
+        if byte_range is False:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return
+        start, end = byte_range or (0, size - 1)
+        if head_only:
+            self.send_headers(path, url, size, byte_range, start, end)
+            return
+        with metrics.span("serve", tool="media", codec=os.path.splitext(path)[1].lstrip(".")) as span:
+            self.send_headers(path, url, size, byte_range, start, end)
+            span["bytes_written"] = self.send_body(path, start, end)
+
+    def send_headers(self, path, url, size, byte_range, start, end):
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        if "download" in parse_qs(url.query):
+            self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(os.path.basename(path))}")
+        self.end_headers()
+
+    def send_body(self, path, start, end):
+        sent = 0
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+                sent += len(chunk)
+        return sent
+
+    def do_GET(self):
+        try:
+            self.send_file(head_only=False)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_HEAD(self):
+        self.send_file(head_only=True)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def send_metrics(self, head_only):
+        if urlparse(self.path).path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.aggregator.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_metrics(head_only=False)
+
+    def do_HEAD(self):
+        self.send_metrics(head_only=True)
+
+    def log_message(self, format, *args):
+        pass
+
+# ==============================
+# Server Lifecycle & URLs
+# ==============================
+def ensure_server():
+    global _server
+    with _lock:
+        if _server is None and MEDIA_ENABLED:
+            try:
+                _server = ThreadingHTTPServer((MEDIA_HOST, MEDIA_PORT), MediaHandler)
+            except OSError:
+                return False
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server is not None
+
+
+def ensure_metrics_server():
+    global _metrics_server
+    with _lock:
+        if _metrics_server is None and metrics.METRICS_ENABLED and METRICS_PORT:
+            try:
+                _metrics_server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), MetricsHandler)
+            except OSError:
+                return False
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+        return _metrics_server is not None
+
+
+def media_url(output_path, download=False):
+    job_id = os.path.basename(os.path.dirname(output_path))
+    name = quote(os.path.basename(output_path))
+    return f"{MEDIA_BASE_URL.rstrip('/')}/{job_id}/{name}" + ("?download=1" if download else "")
@@ -0,0 +1,194 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ==============================
+# Settings
+# ==============================
+# Every stage (spool, probe, render, serve) records one span as a JSON line. Any process may append;
+# the loopback /metrics listener (media_server.ensure_metrics_server) tails it into Prometheus histograms.
+METRICS_ENABLED = os.environ.get("METRICS", "1") != "0"
+METRICS_LOG = os.environ.get("METRICS_LOG", os.path.join(
+    os.environ.get("RENDER_JOBS_DIR", os.path.join(tempfile.gettempdir(), "video_editor_jobs")), "metrics.jsonl"))
+# Past this size the log is rotated to METRICS_LOG + ".1" (one generation kept)
+METRICS_MAX_BYTES = int(os.environ.get("METRICS_MAX_BYTES", 50 * 1024 ** 2))
+BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+LABELS = ("stage", "tool", "codec")
+
+_open_spans = []
+_spans_lock = threading.Lock()
+
+# ==============================
+# Spans
+# ==============================
+def process_usage():
+    # Whole process plus waited-for children. Only meaningful in a process dedicated to one task
+    # (benchmark cases); spans in the shared server use thread CPU and per-child usage instead.
+    if resource is None:
+        return time.process_time(), None
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    return cpu, max(own.ru_maxrss, children.ru_maxrss) * 1024
+
+
+def add_child_usage(cpu_seconds, maxrss_bytes):
+    # Called by ffmpeg_utils.run_ffmpeg with the rusage of each reaped ffmpeg process
+    with _spans_lock:
+        for record in _open_spans:
+            record["child_cpu_seconds"] = record.get("child_cpu_seconds", 0.0) + cpu_seconds
+            record["peak_rss_bytes"] = max(record.get("peak_rss_bytes") or 0, maxrss_bytes)
+
+
+def write_span(record):
+    line = json.dumps(record, default=str) + "\n"
+    try:
+        os.makedirs(os.path.dirname(METRICS_LOG), exist_ok=True)
+        # One O_APPEND write per span, so lines from concurrent processes never interleave
+        fd = os.open(METRICS_LOG, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+            stat = os.fstat(fd)
+        finally:
+            os.close(fd)
+        if stat.st_size > METRICS_MAX_BYTES:
+            rotate(stat.st_ino)
+    except OSError:
+        pass
+
+
+def rotate(inode):
+    # Only the writer that still sees the oversized file at METRICS_LOG moves it, so concurrent
+    # processes crossing the limit together don't rotate the fresh log over the backup
+    try:
+        if os.stat(METRICS_LOG).st_ino == inode:
+            os.replace(METRICS_LOG, METRICS_LOG + ".1")
+    except OSError:
+        pass
+
+
+@contextmanager
+def span(stage, children=False, **fields):
+    # Yields a dict the caller can add bytes_read / bytes_written / frames / media_seconds to.
+    # CPU is this thread's own; children=True also collects every ffmpeg process reaped meanwhile,
+    # which is only attributable in a process running one job (render workers), never in the server.
+    if not METRICS_ENABLED:
+        yield {}
+        return
+    record = {"stage": stage, **fields}
+    if children:
+        with _spans_lock:
+            _open_spans.append(record)
+    cpu_start = time.thread_time()
+    started, wall_start = time.time(), time.perf_counter()
+    status = "ok"
+    try:
+        yield record
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        if children:
+            with _spans_lock:
+                _open_spans.remove(record)
+        seconds = time.perf_counter() - wall_start
+        # peak_rss_bytes is only present when measured per child; the server's own high-water mark isn't per span
+        record.update(status=status, started=started, seconds=seconds,
+                      cpu_seconds=time.thread_time() - cpu_start + record.pop("child_cpu_seconds", 0.0),
+                      pid=os.getpid())
+        if record.get("frames"):
+            record["fps"] = record["frames"] / max(seconds, 1e-6)
+        if record.get("media_seconds"):
+            record["realtime"] = record["media_seconds"] / max(seconds, 1e-6)
+        write_span(record)
+
+def record(stage, seconds, **fields):
+    # For stages timed by the caller (e.g. a whole Streamlit rerun), where a span can't wrap the work
+    if METRICS_ENABLED:
+        write_span({"stage": stage, **fields, "status": "ok", "started": time.time() - seconds,
+                    "seconds": seconds, "pid": os.getpid()})
+
+# ==============================
+# Prometheus Aggregation
+# ==============================
+class Aggregator:
+    # Incrementally tails the span log, so a scrape only parses lines written since the last one
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        try:
+            if os.path.getsize(self.path) < self.offset:
+                self.offset = 0  # log was rotated or truncated
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return
+        # Only consume complete lines; a partial one is picked up on the next scrape
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+        for line in data[:end].splitlines():
+            try:
+                self.add(json.loads(line))
+            except ValueError:
+                continue
+
+    def add(self, record):
+        labels = tuple(str(record.get(k) or "") for k in LABELS)
+        s = self.series.setdefault(labels, {
+            "buckets": [0] * len(BUCKETS), "count": 0, "sum": 0.0, "cpu": 0.0,
+            "read": 0, "written": 0, "errors": 0, "peak_rss": 0,
+        })
+        seconds = record.get("seconds", 0.0)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                s["buckets"][i] += 1
+        s["count"] += 1
+        s["sum"] += seconds
+        s["cpu"] += record.get("cpu_seconds") or 0.0
+        s["read"] += record.get("bytes_read") or 0
+        s["written"] += record.get("bytes_written") or 0
+        s["errors"] += record.get("status") == "error"
+        s["peak_rss"] = max(s["peak_rss"], record.get("peak_rss_bytes") or 0)
+
+    def render(self):
+        with self.lock:
+            self.refresh()
+            lines = [
+                "# HELP video_editor_stage_seconds Wall time per stage.",
+                "# TYPE video_editor_stage_seconds histogram",
+            ]
+            counters = {
+                "cpu_seconds_total": ("counter", "CPU seconds per stage, including ffmpeg children.", "cpu"),
+                "bytes_read_total": ("counter", "Bytes read per stage.", "read"),
+                "bytes_written_total": ("counter", "Bytes written per stage.", "written"),
+                "errors_total": ("counter", "Failed spans per stage.", "errors"),
+                "peak_rss_bytes": ("gauge", "Highest ffmpeg peak RSS seen for a stage.", "peak_rss"),
+            }
+            for labels, s in sorted(self.series.items()):
+                base = ",".join(f'{k}="{v}"' for k, v in zip(LABELS, labels))
+                for bound, count in zip(BUCKETS, s["buckets"]):
+                    lines.append(f'video_editor_stage_seconds_bucket{{{base},le="{bound}"}} {count}')
+                lines.append(f'video_editor_stage_seconds_bucket{{{base},le="+Inf"}} {s["count"]}')
+                lines.append(f"video_editor_stage_seconds_sum{{{base}}} {s['sum']:.6f}")
+                lines.append(f"video_editor_stage_seconds_count{{{base}}} {s['count']}")
+            for name, (kind, help_text, key) in counters.items():
+                lines += [f"# HELP video_editor_stage_{name} {help_text}", f"# TYPE video_editor_stage_{name} {kind}"]
+                for labels, s in sorted(self.series.items()):
+                    base = ",".join(f'{k}="{v}"' for k, v in zip(LABELS, labels))
+                    lines.append(f"video_editor_stage_{name}{{{base}}} {s[key]}")
+            return "\n".join(lines) + "\n"
+
+
+aggregator = Aggregator(METRICS_LOG)
@@ -1,7 +1,7 @@
-import os
-import pandas as pd
 import streamlit as st
 
+import feedback_store as fs
+
 def contact_page():
     st.set_page_config(
         page_title="Contact Us - Professional Online Video Editor", 
@@ -23,30 +23,12 @@ def contact_page():
     st.write("💼 LinkedIn: https://www.linkedin.com/in/qasim-saleem-b74a73168/")
 
 
-    # =======================
-    # Feedback Storage Setup
-    # =======================
-    FEEDBACK_FILE = "feedback.csv"
-
-    def load_feedback():
-        if os.path.exists(FEEDBACK_FILE):
-            return pd.read_csv(FEEDBACK_FILE).to_dict("records")
-        return []
-
-    def save_feedback(feedback_list):
-        df = pd.DataFrame(feedback_list)
-        df.to_csv(FEEDBACK_FILE, index=False)
-
     # =======================
     # Streamlit Feedback Form
     # =======================
     st.header("Feedback Form")
     st.write("We`d love to hear from you! 💬")
 
-    # Initialize session state
-    if "feedback_messages" not in st.session_state:
-        st.session_state.feedback_messages = load_feedback()
-
     with st.form("contact_form"):
         name = st.text_input("Your Name")
         email = st.text_input("Your Email")
@@ -55,21 +37,9 @@ def contact_page():
 
         if submitted:
             if name.strip() and email.strip() and message.strip():
-                # Remove old message from same email
-                st.session_state.feedback_messages = [
-                    fb for fb in st.session_state.feedback_messages if fb["email"] != email
-                ]
-                # Add new message
-                st.session_state.feedback_messages.append({
-                    "name": name,
-                    "email": email,
-                    "message": message
-                })
-                # Keep only latest 50
-                if len(st.session_state.feedback_messages) > 50:
-                    st.session_state.feedback_messages.pop(0)
-                # Save
-                save_feedback(st.session_state.feedback_messages)
+                # One upsert keyed by email: replaces that sender's older message, touches nothing else
+                fs.upsert(name, email, message)
+                st.session_state.feedback_pages = 1
                 st.success("✅ Thank you! Your message has been received.")
             else:
                 st.error("⚠️ Please fill in all fields before submitting.")
@@ -77,10 +47,20 @@ def contact_page():
     # =======================
     # Display Latest Feedback
     # =======================
-    if st.session_state.feedback_messages:
+    if "feedback_pages" not in st.session_state:
+        st.session_state.feedback_pages = 1
+
+    feedback_messages, cursor = [], None
+    for _ in range(st.session_state.feedback_pages):
+        page, cursor = fs.latest(fs.PAGE_SIZE, cursor)
+        feedback_messages += page
+        if cursor is None:
+            break
+
+    if feedback_messages:
         st.subheader("Latest Feedback")
         # Display feedback messages
-        for fb in reversed(st.session_state.feedback_messages):
+        for fb in feedback_messages:
             with st.container():
                 # Name & email
                 st.subheader(fb["name"])
@@ -90,6 +70,9 @@ def contact_page():
                 st.write(fb["message"])
 
                 # Optional divider for style
+        if cursor is not None and st.button("Show more"):
+            st.session_state.feedback_pages += 1
+            st.rerun()
     # Footer
     st.write("---")
     st.info("💡 We aim to respond to all inquiries within 24-48 hours.")
@@ -0,0 +1,98 @@
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ffmpeg_utils as ff
+import upload_cache as uc
+
+# ==============================
+# Settings
+# ==============================
+# Low-bitrate proxies and thumbnail strips are generated once per upload (content hash)
+# so the trim/concat screens can preview without touching the original.
+PREVIEW_WORKERS = int(os.environ.get("PREVIEW_WORKERS", 2))
+PROXY_HEIGHT = 360
+PROXY_SUFFIX = ".proxy.mp4"
+THUMBS_SUFFIX = ".thumbs.jpg"
+THUMB_COUNT = 12
+THUMB_WIDTH = 160
+
+_executor = ThreadPoolExecutor(PREVIEW_WORKERS)
+_pending = {}
+_failed = set()
+_lock = threading.Lock()
+
+# ==============================
+# Generation
+# ==============================
+def thumb_interval(duration):
+    return max(1.0, math.ceil(duration / THUMB_COUNT))
+
+
+def make_proxy(path, output):
+    tmp = output + ".part.mp4"
+    ff.run_ffmpeg([
+        "-i", path, "-map", "0:v:0", "-map", "0:a?",
+        "-vf", f"scale=-2:{PROXY_HEIGHT}", "-c:v", "libx264", "-preset", "veryfast", "-crf", "32",
+        "-c:a", "aac", "-b:a", "64k", "-movflags", "+faststart", tmp,
+    ], track=False)
+    os.replace(tmp, output)
+
+
+def make_thumbnails(path, output, duration):
+    interval = thumb_interval(duration)
+    count = max(1, min(THUMB_COUNT, math.ceil(duration / interval)))
+    tmp = output + ".part.jpg"
+    ff.run_ffmpeg([
+        "-i", path, "-map", "0:v:0",
+        "-vf", f"fps=1/{interval},scale={THUMB_WIDTH}:-2,tile={count}x1",
+        "-frames:v", "1", "-q:v", "4", tmp,
+    ], track=False)
+    os.replace(tmp, output)
+
+
+def generate(path):
+    try:
+        duration = uc.probe_metadata(path)["duration"]
+        thumbs = uc.derived_path(path, THUMBS_SUFFIX)
+        if not os.path.exists(thumbs):
+            make_thumbnails(path, thumbs, duration)
+        proxy = uc.derived_path(path, PROXY_SUFFIX)
+        if not os.path.exists(proxy):
+            make_proxy(path, proxy)
+    except (ff.FFmpegError, OSError):
+        with _lock:
+            _failed.add(path)
+    finally:
+        with _lock:
+            _pending.pop(path, None)
+
+# ==============================
+# Public API
+# ==============================
+def request_previews(path):
+    if previews_ready(path):
+        return
+    with _lock:
+        if path not in _pending and path not in _failed:
+            _pending[path] = _executor.submit(generate, path)
+
+
+def is_pending(path):
+    with _lock:
+        return path in _pending
+
+
+def proxy_path(path):
+    proxy = uc.derived_path(path, PROXY_SUFFIX)
+    return proxy if os.path.exists(proxy) else None
+
+
+def thumbnails_path(path):
+    thumbs = uc.derived_path(path, THUMBS_SUFFIX)
+    return thumbs if os.path.exists(thumbs) else None
+
+
+def previews_ready(path):
+    return proxy_path(path) is not None and thumbnails_path(path) is not None
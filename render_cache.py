@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import upload_cache
+
+# ==============================
+# Settings
+# ==============================
+# Maps a render key (input content hashes + tool + parameters) to the job that produced it.
+# The cache owns the lifetime of those job directories.
+INDEX_PATH = os.path.join(os.environ.get("RENDER_JOBS_DIR", os.path.join(tempfile.gettempdir(), "video_editor_jobs")), "render_cache.json")
+MAX_CACHE_BYTES = int(os.environ.get("RENDER_CACHE_BYTES", 20 * 1024 ** 3))
+CACHE_TTL = float(os.environ.get("RENDER_CACHE_TTL", 24 * 3600))
+
+_lock = threading.Lock()
+_entries = None
+stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+# ==============================
+# Keys
+# ==============================
+def render_key(tool, input_paths, params):
+    payload = {
+        "tool": tool,
+        "inputs": [upload_cache.content_hash(p) for p in input_paths],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+# ==============================
+# Index
+# ==============================
+def entries():
+    global _entries
+    if _entries is None:
+        try:
+            with open(INDEX_PATH) as f:
+                _entries = json.load(f)
+        except (OSError, ValueError):
+            _entries = {}
+    return _entries
+
+
+def save_index():
+    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+    tmp = INDEX_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(entries(), f)
+    os.replace(tmp, INDEX_PATH)
+
+
+def lookup(key, is_usable):
+    # is_usable(job_id) -> (usable, size_bytes); in-flight jobs count as usable so duplicates coalesce
+    with _lock:
+        entry = entries().get(key)
+        if entry and time.time() - entry["created"] < CACHE_TTL:
+            usable, size = is_usable(entry["job_id"])
+            if usable:
+                entry["last_used"] = time.time()
+                entry["size"] = size
+                stats["hits"] += 1
+                save_index()
+                return entry["job_id"]
+        if entry:
+            entries().pop(key)
+            save_index()
+        stats["misses"] += 1
+        return None
+
+
+def store(key, job_id, job_dir, is_active):
+    with _lock:
+        now = time.time()
+        entries()[key] = {"job_id": job_id, "dir": job_dir, "created": now, "last_used": now, "size": 0}
+        evict(is_active)
+        save_index()
+
+
+def record_size(key, size):
+    with _lock:
+        if key in entries():
+            entries()[key]["size"] = size
+            save_index()
+
+# ==============================
+# Eviction
+# ==============================
+def evict(is_active):
+    # Called with _lock held: drops expired entries, then least recently used until under the byte budget
+    now = time.time()
+    items = sorted(entries().items(), key=lambda kv: kv[1]["last_used"])
+    total = sum(e.get("size", 0) for _, e in items)
+    for key, entry in items:
+        expired = now - entry["created"] >= CACHE_TTL
+        if not expired and total <= MAX_CACHE_BYTES:
+            continue
+        if is_active(entry["job_id"]):
+            continue
+        shutil.rmtree(entry["dir"], ignore_errors=True)
+        entries().pop(key, None)
+        total -= entry.get("size", 0)
+        stats["evictions"] += 1
+
+
+def sweep(is_active):
+    # Periodic TTL/quota pass (the janitor); store() only evicts when something new is added
+    global _entries
+    with _lock:
+        _entries = None  # other processes may have written the index
+        evict(is_active)
+        save_index()
+
+
+def job_ids():
+    with _lock:
+        return {entry["job_id"] for entry in entries().values()}
+
+
+def cache_stats():
+    with _lock:
+        return {**stats, "entries": len(entries()), "bytes": sum(e.get("size", 0) for e in entries().values())}
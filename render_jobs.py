@@ -0,0 +1,247 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from proglog import ProgressBarLogger
+
+from streamlit_logger import ProgressTracker
+
+import metrics
+import render_cache
+import upload_cache
+from resource_governor import governor, AdmissionError, MAX_RENDERS
+
+# ==============================
+# Settings
+# ==============================
+# Renders run in worker processes so they never block (or get interrupted by) a Streamlit rerun.
+# The governor admits at most MAX_RENDERS jobs at once, so the pool never queues internally.
+JOBS_DIR = os.environ.get("RENDER_JOBS_DIR", os.path.join(tempfile.gettempdir(), "video_editor_jobs"))
+ACTIVE_STATUSES = ("queued", "running")
+
+_executor = None
+_futures = {}
+_pinned = {}  # job_id -> upload_cache paths its render reads
+_lock = threading.Lock()
+
+# ==============================
+# Job Records (one JSON file per job)
+# ==============================
+def job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def read_job(job_id):
+    try:
+        with open(os.path.join(job_dir(job_id), "job.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_job(job):
+    path = os.path.join(job_dir(job["id"]), "job.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp, path)
+
+
+def update_job(job_id, **fields):
+    job = read_job(job_id)
+    if job is not None:
+        job.update(fields)
+        write_job(job)
+    return job
+
+# ==============================
+# Worker Side
+# ==============================
+def emit_progress(job_id, snapshot):
+    update_job(job_id, progress=snapshot["progress"], stats=snapshot)
+
+
+class JobProgressLogger(ProgressBarLogger):
+    # moviepy renders: per-bar throttled progress written to the job record
+    def __init__(self, job_id, total_frames=None, fps=None):
+        super().__init__()
+        self.job_id = job_id
+        self.duration = total_frames / fps if total_frames and fps else None
+        self.fps = fps
+        self.trackers = {}
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if attr != "index":
+            return
+        try:
+            fraction = value / max(self.bars[bar]["total"], 1)
+        except Exception:
+            return
+        if bar not in self.trackers:
+            self.trackers[bar] = ProgressTracker(self.duration, self.fps, lambda s: emit_progress(self.job_id, s))
+        self.trackers[bar].update(fraction)
+
+
+class FFmpegJobProgress:
+    # ffmpeg renders: sums the output time reported by every ffmpeg process of the job
+    def __init__(self, job_id, duration):
+        self.duration = duration
+        self.written = {}
+        self.lock = threading.Lock()
+        self.tracker = ProgressTracker(duration, None, lambda s: emit_progress(job_id, s))
+
+    def __call__(self, key, seconds):
+        with self.lock:
+            self.written[key] = seconds
+            if self.duration:
+                self.tracker.update(sum(self.written.values()) / self.duration)
+
+
+def input_paths(kwargs):
+    return [v for k, v in kwargs.items() if k.endswith("_path") and v] + list(kwargs.get("paths") or [])
+
+
+def render_span(span, kwargs, media_seconds):
+    paths = input_paths(kwargs)
+    meta = upload_cache.cached_metadata(paths[0]) if paths else None
+    span.update(
+        bytes_read=sum(os.path.getsize(p) for p in paths if os.path.exists(p)),
+        bytes_written=os.path.getsize(kwargs["output"]) if os.path.exists(kwargs["output"]) else 0,
+        media_seconds=media_seconds,
+        frames=int(media_seconds * meta["fps"]) if media_seconds and meta and meta.get("fps") else None,
+    )
+
+
+def run_job(job_id, tool, kwargs):
+    import ffmpeg_utils as ff
+    import video_engine as ve
+
+    # The encoding profile is job state, not an engine argument (encoding_profiles)
+    kwargs = dict(kwargs)
+    profile = kwargs.pop("profile", None)
+    update_job(job_id, status="running", started=time.time(), profile=profile)
+    with metrics.span("render", children=True, tool=tool, codec=kwargs.get("codec"), engine=kwargs.get("engine"),
+                      profile=profile, job=job_id) as span:
+        try:
+            media_seconds = ve.output_duration(tool, kwargs)
+            ff.set_progress_callback(FFmpegJobProgress(job_id, media_seconds))
+            ff.set_encoding_profile(profile)
+            logger_factory = lambda total, fps=None: JobProgressLogger(job_id, total, fps)
+            started = time.perf_counter()
+            result = getattr(ve, tool)(**kwargs, logger_factory=logger_factory)
+            wall = time.perf_counter() - started
+            render_span(span, kwargs, media_seconds)
+            speed = {"seconds": round(wall, 3), "realtime": round(media_seconds / max(wall, 1e-6), 3) if media_seconds else None,
+                     "fps": round(span["frames"] / max(wall, 1e-6), 1) if span.get("frames") else None}
+            update_job(job_id, status="done", progress=1.0, result=result, speed=speed, finished=time.time())
+        except Exception as e:
+            update_job(job_id, status="failed", error=str(e), finished=time.time())
+            raise
+        finally:
+            ff.set_progress_callback(None)
+            ff.set_encoding_profile(None)
+
+# ==============================
+# Submission & Polling
+# ==============================
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: forking the multi-threaded Streamlit server is unsafe
+            _executor = ProcessPoolExecutor(MAX_RENDERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def is_active(job_id):
+    job = read_job(job_id)
+    return bool(job) and job["status"] in ACTIVE_STATUSES
+
+
+def cached_job(job_id):
+    job = read_job(job_id)
+    if not job:
+        return False, 0
+    if job["status"] in ACTIVE_STATUSES:
+        return True, 0
+    if job["status"] == "done" and os.path.exists(job["output"]):
+        return True, os.path.getsize(job["output"])
+    return False, 0
+
+
+def submit(tool, output_name, session_id=None, cache_key=None, **kwargs):
+    # Returns an existing job when an identical render is cached or already in flight.
+    # Raises resource_governor.AdmissionError when the render queue is full.
+    if cache_key:
+        cached = render_cache.lookup(cache_key, cached_job)
+        if cached:
+            return cached
+    job_id = uuid.uuid4().hex[:12]
+    os.makedirs(job_dir(job_id), exist_ok=True)
+    output = os.path.join(job_dir(job_id), output_name)
+    inputs = [v for value in kwargs.values() for v in (value if isinstance(value, (list, tuple)) else [value])
+              if isinstance(v, str)]
+    with _lock:
+        _pinned[job_id] = upload_cache.pin(inputs)
+    write_job({
+        "id": job_id, "tool": tool, "status": "queued", "progress": 0.0,
+        "params": kwargs, "cache_key": cache_key, "output": output, "name": output_name, "result": None, "error": None,
+        "submitted": time.time(), "started": None, "finished": None,
+    })
+    try:
+        governor.admit_render(job_id, session_id, lambda: start_job(job_id, tool, {**kwargs, "output": output}))
+    except AdmissionError as e:
+        unpin_inputs(job_id)
+        update_job(job_id, status="failed", error=str(e), finished=time.time())
+        raise
+    if cache_key:
+        render_cache.store(cache_key, job_id, job_dir(job_id), is_active)
+    return job_id
+
+
+def start_job(job_id, tool, kwargs):
+    global _executor
+    try:
+        future = get_executor().submit(run_job, job_id, tool, kwargs)
+    except Exception as e:
+        # A broken pool (e.g. a worker was killed) is rebuilt on the next submission
+        with _lock:
+            _executor = None
+        unpin_inputs(job_id)
+        update_job(job_id, status="failed", error=str(e), finished=time.time())
+        raise
+    with _lock:
+        _futures[job_id] = future
+    future.add_done_callback(lambda f: on_job_finished(job_id, f))
+
+
+def unpin_inputs(job_id):
+    with _lock:
+        paths = _pinned.pop(job_id, [])
+    upload_cache.unpin(paths)
+
+
+def on_job_finished(job_id, future):
+    with _lock:
+        _futures.pop(job_id, None)
+    governor.release_render(job_id)
+    unpin_inputs(job_id)
+    # Catches workers that died without writing their own status (e.g. killed by the OOM killer)
+    job = read_job(job_id)
+    if job and job["status"] in ACTIVE_STATUSES:
+        error = future.exception() if not future.cancelled() else "cancelled"
+        job = update_job(job_id, status="failed", error=str(error), finished=time.time())
+    if job and job["cache_key"] and job["status"] == "done" and os.path.exists(job["output"]):
+        render_cache.record_size(job["cache_key"], os.path.getsize(job["output"]))
+
+
+def status(job_id):
+    job = read_job(job_id) if job_id else None
+    if job and job["status"] == "queued":
+        job["position"] = governor.queue_position(job_id)
+    return job
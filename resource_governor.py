@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# ==============================
+# Limits
+# ==============================
+MAX_RENDERS = int(os.environ.get("MAX_RENDERS", max(1, (os.cpu_count() or 2) // 2)))
+MAX_SESSION_RENDERS = int(os.environ.get("MAX_SESSION_RENDERS", 1))
+MAX_QUEUED_RENDERS = int(os.environ.get("MAX_QUEUED_RENDERS", 50))
+MAX_READERS = int(os.environ.get("MAX_READERS", 32))
+MAX_SESSION_READERS = int(os.environ.get("MAX_SESSION_READERS", 4))
+READER_TIMEOUT = float(os.environ.get("READER_TIMEOUT", 30))
+
+
+class AdmissionError(RuntimeError):
+    pass
+
+# ==============================
+# Governor
+# ==============================
+class ResourceGovernor:
+    def __init__(self, max_renders, max_session_renders, max_queued, max_readers, max_session_readers):
+        self.max_renders = max_renders
+        self.max_session_renders = max_session_renders
+        self.max_queued = max_queued
+        self.max_readers = max_readers
+        self.max_session_readers = max_session_readers
+        self.cond = threading.Condition()
+        self.pending = deque()
+        self.running = {}
+        self.readers = Counter()
+
+    # ---------- Renders ----------
+    def admit_render(self, job_id, session_id, start):
+        with self.cond:
+            if len(self.pending) >= self.max_queued:
+                raise AdmissionError("The render queue is full, please try again in a few minutes.")
+            self.pending.append((job_id, session_id, start))
+            self.dispatch()
+
+    def release_render(self, job_id):
+        with self.cond:
+            self.running.pop(job_id, None)
+            self.dispatch()
+
+    def dispatch(self):
+        # FIFO, but a session at its cap doesn't hold back other sessions' jobs
+        for item in list(self.pending):
+            if len(self.running) >= self.max_renders:
+                break
+            if item not in self.pending:
+                continue
+            job_id, session_id, start = item
+            if Counter(self.running.values())[session_id] >= self.max_session_renders:
+                continue
+            self.pending.remove(item)
+            self.running[job_id] = session_id
+            try:
+                start()
+            except Exception:
+                # The starter records its own failure; just free the slot
+                self.running.pop(job_id, None)
+
+    def queue_position(self, job_id):
+        with self.cond:
+            for position, (pending_id, _, _) in enumerate(self.pending, start=1):
+                if pending_id == job_id:
+                    return position
+        return None
+
+    # ---------- Readers ----------
+    @contextmanager
+    def reader_slots(self, session_id, count=1):
+        deadline = time.monotonic() + READER_TIMEOUT
+        with self.cond:
+            while (sum(self.readers.values()) + count > self.max_readers
+                   or self.readers[session_id] + count > self.max_session_readers):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AdmissionError("The server is busy reading other files, please try again shortly.")
+                self.cond.wait(remaining)
+            self.readers[session_id] += count
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.readers[session_id] -= count
+                if self.readers[session_id] <= 0:
+                    del self.readers[session_id]
+                self.cond.notify_all()
+
+    def utilisation(self):
+        with self.cond:
+            return {
+                "renders_running": len(self.running),
+                "renders_limit": self.max_renders,
+                "renders_queued": len(self.pending),
+                "queue_limit": self.max_queued,
+                "readers_open": sum(self.readers.values()),
+                "readers_limit": self.max_readers,
+            }
+
+
+governor = ResourceGovernor(MAX_RENDERS, MAX_SESSION_RENDERS, MAX_QUEUED_RENDERS, MAX_READERS, MAX_SESSION_READERS)
@@ -1,27 +1,57 @@
-
-import streamlit as st
-from proglog import ProgressBarLogger
+import time
 
 # ==============================
-# Custom logger for Streamlit
+# Throttled progress tracking
 # ==============================
-class StreamlitLogger(ProgressBarLogger):
-    def __init__(self, total_frames=None):
-        super().__init__()
-        self.progress_bar = st.progress(0)
-        self.progress_text = st.empty()
-        self.total_frames = total_frames
+# Coalesces per-frame callbacks into at most one update per `min_interval` seconds and
+# `min_step` percent, so a long render doesn't flood the browser with websocket deltas.
+class ProgressTracker:
+    def __init__(self, duration=None, fps=None, emit=None, min_interval=0.5, min_step=1.0):
+        self.duration = duration
+        self.fps = fps
+        self.emit = emit
+        self.min_interval = min_interval
+        self.min_step = min_step
+        self.started = time.monotonic()
+        self.last_emit = None
+        self.last_fraction = 0.0
+
+    def update(self, fraction):
+        fraction = min(max(fraction, 0.0), 1.0)
+        now = time.monotonic()
+        due = self.last_emit is None or (
+            now - self.last_emit >= self.min_interval
+            and (fraction - self.last_fraction) * 100 >= self.min_step
+        )
+        if not due and fraction < 1.0:
+            return None
+        if fraction == self.last_fraction and self.last_emit is not None:
+            return None
+        self.last_emit, self.last_fraction = now, fraction
+        snapshot = self.snapshot(fraction, now)
+        if self.emit:
+            self.emit(snapshot)
+        return snapshot
 
-    def bars_callback(self, bar, attr, value, old_value=None):
-        try:
-            total = self.bars[bar]["total"]
-            pct = int((value / max(total, 1)) * 100)
-        except Exception:
-            pct = 0
+    def snapshot(self, fraction, now=None):
+        elapsed = max((now or time.monotonic()) - self.started, 1e-6)
+        realtime = fraction * self.duration / elapsed if self.duration else None
+        return {
+            "progress": fraction,
+            "elapsed": elapsed,
+            "realtime": realtime,
+            "fps": realtime * self.fps if realtime and self.fps else None,
+            "eta": elapsed * (1 - fraction) / fraction if fraction > 0 else None,
+        }
 
-        if self.total_frames:
-            self.progress_text.text(f"{bar.capitalize()} progress: {pct}% ({value}/{self.total_frames} frames)")
-        else:
-            self.progress_text.text(f"{bar} progress: {pct}%")
 
-        self.progress_bar.progress(min(max(pct, 0), 100))
\ No newline at end of file
+def format_progress(snapshot, label="Rendering"):
+    parts = [f"{label}... {int(snapshot.get('progress', 0) * 100)}%"]
+    if snapshot.get("fps"):
+        parts.append(f"{snapshot['fps']:.1f} fps")
+    if snapshot.get("realtime"):
+        parts.append(f"{snapshot['realtime']:.2f}x realtime")
+    if snapshot.get("eta") is not None:
+        minutes, seconds = divmod(int(snapshot["eta"]), 60)
+        parts.append(f"ETA {minutes}:{seconds:02d}")
+    return " · ".join(parts)
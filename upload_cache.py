@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import ffmpeg_utils as ff
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: pins only protect against eviction by this process
+    fcntl = None
+
+# ==============================
+# Settings
+# ==============================
+# Uploads are stored by SHA-256 of their content, so identical files (same session or not)
+# share one spool and one probe.
+CACHE_DIR = os.environ.get("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "video_editor_uploads"))
+MAX_CACHE_BYTES = int(os.environ.get("UPLOAD_CACHE_BYTES", 20 * 1024 ** 3))
+# Only bridges an upload's spool and its job submission; jobs pin their inputs (render_jobs, batch_cli)
+EVICTION_GRACE = float(os.environ.get("UPLOAD_CACHE_GRACE", 60))
+CHUNK_SIZE = 1024 * 1024
+META_SUFFIX = ".meta.json"
+# A pin is a shared flock on this file, so evict() in every process sharing the store honours it
+# and a crashed process never leaves an entry pinned
+LOCK_SUFFIX = ".lock"
+
+_paths = {}
+_metadata = {}
+_pinned = {}  # path -> [number of jobs here reading it, fd holding the shared lock]
+_lock = threading.Lock()
+
+# ==============================
+# Spooling
+# ==============================
+def upload_id(uploaded_file):
+    return getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}_{uploaded_file.size}"
+
+
+def iter_chunks(uploaded_file):
+    # Zero-copy slices of the upload buffer keep peak memory at one chunk
+    try:
+        view = uploaded_file.getbuffer()
+    except AttributeError:
+        uploaded_file.seek(0)
+        yield from iter(lambda: uploaded_file.read(CHUNK_SIZE), b"")
+        return
+    try:
+        for offset in range(0, len(view), CHUNK_SIZE):
+            yield view[offset:offset + CHUNK_SIZE]
+    finally:
+        view.release()
+
+
+def touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def spool(uploaded_file, suffix=".mp4"):
+    key = (upload_id(uploaded_file), suffix)
+    with _lock:
+        path = _paths.get(key)
+    if path and os.path.exists(path):
+        touch(path)
+        return path
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    hasher = hashlib.sha256()
+    tmp = tempfile.NamedTemporaryFile(delete=False, dir=CACHE_DIR, suffix=".part")
+    with metrics.span("spool", tool="upload", codec=suffix.lstrip(".")) as span:
+        try:
+            size = 0
+            for chunk in iter_chunks(uploaded_file):
+                hasher.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+            tmp.close()
+            path = os.path.join(CACHE_DIR, f"{hasher.hexdigest()}{suffix}")
+            if os.path.exists(path):
+                os.remove(tmp.name)
+            else:
+                os.replace(tmp.name, path)
+        except BaseException:
+            tmp.close()
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+            raise
+        span.update(bytes_read=size, bytes_written=size)
+    touch(path)
+    with _lock:
+        _paths[key] = path
+    evict(keep=path)
+    return path
+
+
+def ingest(source):
+    # Files already on disk (batch jobs): hash in chunks, then copy into the store.
+    # Not hard-linked: editing the source in place would silently change a content-addressed entry.
+    hasher = hashlib.sha256()
+    suffix = os.path.splitext(source)[1].lower() or ".bin"
+    with metrics.span("spool", tool="ingest", codec=suffix.lstrip(".")) as span:
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, f"{hasher.hexdigest()}{suffix}")
+        span["bytes_read"] = os.path.getsize(source)
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.part"
+            shutil.copyfile(source, tmp)
+            os.replace(tmp, path)
+            span["bytes_written"] = span["bytes_read"]
+    touch(path)
+    evict(keep=path)
+    return path
+
+
+def content_hash(path):
+    return os.path.basename(path).split(".", 1)[0]
+
+
+def derived_path(path, suffix):
+    # Files derived from an upload (probe metadata, previews, indexes) live and die with it
+    return path + suffix
+
+# ==============================
+# Probe Metadata
+# ==============================
+def metadata_from_probe(info):
+    video = ff.first_stream(info, "video") or {}
+    audio = ff.first_stream(info, "audio") or {}
+    num, _, den = (video.get("avg_frame_rate") or "0/1").partition("/")
+    return {
+        "duration": ff.media_duration(info),
+        "fps": float(num) / float(den) if den and float(den) else None,
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+        "has_audio": bool(audio),
+    }
+
+
+def metadata_from_moviepy(path, kind):
+    from moviepy import VideoFileClip, AudioFileClip
+
+    clip = VideoFileClip(path) if kind == "video" else AudioFileClip(path)
+    try:
+        return {
+            "duration": clip.duration,
+            "fps": getattr(clip, "fps", None),
+            "width": clip.size[0] if kind == "video" else None,
+            "height": clip.size[1] if kind == "video" else None,
+            "video_codec": None,
+            "audio_codec": None,
+            "has_audio": kind == "audio" or clip.audio is not None,
+        }
+    finally:
+        clip.close()
+
+
+def cached_metadata(path):
+    with _lock:
+        if path in _metadata:
+            return _metadata[path]
+    try:
+        with open(derived_path(path, META_SUFFIX)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _metadata[path] = meta
+    return meta
+
+
+def probe_metadata(path, kind="video"):
+    meta = cached_metadata(path)
+    if meta is not None:
+        return meta
+    with metrics.span("probe", tool=kind) as span:
+        try:
+            meta = metadata_from_probe(ff.probe(path))
+        except ff.FFmpegError:
+            meta = metadata_from_moviepy(path, kind)
+        span.update(codec=meta.get("video_codec") or meta.get("audio_codec"), media_seconds=meta.get("duration"))
+    with open(derived_path(path, META_SUFFIX), "w") as f:
+        json.dump(meta, f)
+    with _lock:
+        _metadata[path] = meta
+    return meta
+
+# ==============================
+# LRU Eviction
+# ==============================
+def cache_entries():
+    # Uploads are "<sha256>.<ext>"; anything longer is derived from one and counted against it
+    sizes, mtimes = {}, {}
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".part"):
+            continue
+        base = ".".join(name.split(".")[:2])
+        try:
+            stat = os.stat(os.path.join(CACHE_DIR, name))
+        except OSError:
+            continue
+        sizes[base] = sizes.get(base, 0) + stat.st_size
+        if name == base:
+            mtimes[base] = stat.st_mtime
+    return sorted((mtimes[base], sizes[base], os.path.join(CACHE_DIR, base)) for base in mtimes)
+
+
+def remove_entry(path):
+    import keyframe_index  # imports this module
+
+    prefix = os.path.basename(path)
+    for name in os.listdir(CACHE_DIR):
+        if name == prefix or name.startswith(prefix + "."):
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError:
+                pass
+    with _lock:
+        _metadata.pop(path, None)
+        for key in [k for k, v in _paths.items() if v == path]:
+            del _paths[key]
+    keyframe_index.forget(path)
+
+
+def lock_entry(path, exclusive=False):
+    # Returns the fd holding the lock, None without flock support, False if another holder blocks it
+    if fcntl is None:
+        return None
+    try:
+        fd = os.open(derived_path(path, LOCK_SUFFIX), os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH)
+    except OSError:
+        os.close(fd)
+        return False if exclusive else None
+    return fd
+
+
+def pin(paths):
+    # Protects a job's inputs from eviction by any process until unpin(); paths outside the store are ignored
+    pinned = [os.path.abspath(p) for p in paths if os.path.dirname(os.path.abspath(p)) == os.path.abspath(CACHE_DIR)]
+    with _lock:
+        for path in pinned:
+            if path in _pinned:
+                _pinned[path][0] += 1
+            else:
+                _pinned[path] = [1, lock_entry(path)]
+    return pinned
+
+
+def unpin(paths):
+    with _lock:
+        for path in paths:
+            entry = _pinned.get(path)
+            if entry is None:
+                continue
+            entry[0] -= 1
+            if entry[0] <= 0:
+                del _pinned[path]
+                if entry[1]:
+                    os.close(entry[1])
+
+
+def evict(keep=None):
+    entries = cache_entries()
+    total = sum(size for _, size, _ in entries)
+    now = time.time()
+    with _lock:
+        pinned = set(_pinned)
+    # Least recently used first, never an input of a queued or running render
+    for mtime, size, path in entries:
+        if total <= MAX_CACHE_BYTES:
+            break
+        if path == keep or os.path.abspath(path) in pinned or now - mtime < EVICTION_GRACE:
+            continue
+        fd = lock_entry(path, exclusive=True)
+        if fd is False:
+            continue  # pinned by another process
+        try:
+            remove_entry(path)
+        finally:
+            if fd:
+                os.close(fd)
+        total -= size
+    return total
@@ -1,12 +1,11 @@
 from random import randint
-import tempfile
-import streamlit as st
+import os
+
+import upload_cache
 
 def save_temp_file(uploaded_file, suffix=".mp4"):
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    tmp.write(uploaded_file.read())
-    tmp.close()
-    return tmp.name
+    # Content-addressed: reruns and identical uploads resolve to the same spooled file
+    return upload_cache.spool(uploaded_file, suffix)
 
 def close_and_remove(*clips):
     for clip in clips:
@@ -18,7 +17,6 @@ def close_and_remove(*clips):
 
 
 def remove_temp_files(*files):
-    import os
     for file in files:
         try:
             if file and os.path.exists(file):
@@ -27,5 +25,30 @@ def remove_temp_files(*files):
             pass
 
 
+def parse_timestamp(text):
+    # "75", "1:15", "01:01:15.5" -> seconds
+    seconds = 0.0
+    for part in text.strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_ranges(text):
+    # One "start - end" (or "start, end" / "start end") per line; raises ValueError on bad lines
+    ranges = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.replace(",", " ").replace(" - ", " ").replace("-", " ").split()
+        if len(parts) != 2:
+            raise ValueError(f"Can't read range: {line!r}")
+        start, end = parse_timestamp(parts[0]), parse_timestamp(parts[1])
+        if start >= end:
+            raise ValueError(f"End must be after start: {line!r}")
+        ranges.append((start, end))
+    return ranges
+
+
 def generate_key(prefix):
     return f"{prefix}_{randint(0, 100000)}"
@@ -0,0 +1,471 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+# moviepy (and numpy via audio_mixer) are imported inside the functions that need them, so
+# importing the engine for its constants and the ffmpeg paths stays cheap.
+import ffmpeg_utils as ff
+import keyframe_index as ki
+import utility_functions as uf
+
+RENDER_ENGINES = ["ffmpeg", "moviepy"]
+VIDEO_CODECS = ["libx264", "mpeg4", "libvpx"]
+AUDIO_CODECS = ["aac", "libvorbis", "mp3"]
+# Re-encodes longer than this are split into keyframe-aligned segments encoded in parallel
+SEGMENT_THRESHOLD = float(os.environ.get("SEGMENT_THRESHOLD", 300))
+RENDER_SEGMENTS = int(os.environ.get("RENDER_SEGMENTS", os.cpu_count() or 1))
+
+# ==============================
+# Helpers
+# ==============================
+def try_ffmpeg(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+        return True
+    except ff.FFmpegError:
+        return False
+
+
+def make_logger(logger_factory, clip):
+    return logger_factory(int(clip.fps * clip.duration), fps=clip.fps) if logger_factory else None
+
+
+def segment_count(duration, segments=None):
+    # None = automatic, 0/1 = off, N = force N segments
+    if segments is None:
+        return RENDER_SEGMENTS if duration >= SEGMENT_THRESHOLD else 1
+    return max(1, int(segments))
+
+# ==============================
+# ffmpeg Filtergraph Backend
+# ==============================
+# Each tool becomes a single ffmpeg process: frames and samples never enter Python.
+def trim_graph(duration, has_audio, offset=0.0):
+    graph = f"[0:v]trim=start={offset:.6f}:duration={duration:.6f},setpts=PTS-STARTPTS[v]"
+    if has_audio:
+        graph += f";[0:a]atrim=start={offset:.6f}:duration={duration:.6f},asetpts=PTS-STARTPTS[a]"
+    return graph
+
+
+def normalize_filter(first):
+    width, height = first["width"], first["height"]
+    fps = first.get("r_frame_rate") or "30"
+    return (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format=yuv420p"
+    )
+
+
+def concat_audio_part(i, info):
+    duration = ff.media_duration(info)
+    source = f"[{i}:a]" if ff.first_stream(info, "audio") else "anullsrc=r=44100:cl=stereo,"
+    # Pad/cut every audio segment to its video length so later segments stay in sync
+    return (
+        f"{source}aresample=44100,aformat=sample_fmts=fltp:channel_layouts=stereo,"
+        f"apad,atrim=duration={duration:.6f}[a{i}]"
+    )
+
+
+def concat_graph(infos, video=True):
+    video_filter = normalize_filter(ff.first_stream(infos[0], "video"))
+    with_audio = any(ff.first_stream(info, "audio") for info in infos)
+    parts, labels = [], []
+    for i, info in enumerate(infos):
+        if video:
+            parts.append(f"[{i}:v]{video_filter}[v{i}]")
+            labels.append(f"[v{i}]")
+        if with_audio:
+            parts.append(concat_audio_part(i, info))
+            labels.append(f"[a{i}]")
+    outputs = ("[v]" if video else "") + ("[a]" if with_audio else "")
+    parts.append("".join(labels) + f"concat=n={len(infos)}:v={int(video)}:a={int(with_audio)}{outputs}")
+    return ";".join(parts), with_audio
+
+
+def background_music_graph(duration, has_audio, orig_vol, music_vol):
+    music = f"[1:a]atrim=duration={duration:.6f},asetpts=PTS-STARTPTS,volume={music_vol}"
+    if not has_audio:
+        return music + "[a]"
+    return (
+        f"[0:a]volume={orig_vol}[a0];{music}[a1];"
+        "[a0][a1]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[a]"
+    )
+
+
+def ffmpeg_merge(video_path, audio_path, output, codec, audio_codec):
+    duration = ff.media_duration(ff.probe(video_path))
+    graph = f"[1:a]atrim=duration={duration:.6f},asetpts=PTS-STARTPTS[a]"
+    ff.run_ffmpeg([
+        "-i", video_path, "-i", audio_path, "-filter_complex", graph,
+        "-map", "0:v:0", "-map", "[a]", "-c:v", codec, *ff.video_args(codec), "-c:a", audio_codec,
+        "-movflags", "+faststart", output,
+    ])
+
+
+def ffmpeg_trim(video_path, start, end, output, codec, audio_codec, keyframes=None):
+    has_audio = ff.first_stream(ff.probe(video_path), "audio") is not None
+    maps = ["-map", "[v]"] + (["-map", "[a]", "-c:a", audio_codec] if has_audio else [])
+    # Seek the reader straight to the keyframe before `start` and trim the short lead-in in the graph
+    seek = ki.keyframe_before({"keyframes": keyframes}, start) if keyframes else start
+    ff.run_ffmpeg([
+        "-noaccurate_seek", "-ss", f"{seek:.6f}", "-i", video_path,
+        "-filter_complex", trim_graph(end - start, has_audio, start - seek),
+        *maps, "-c:v", codec, *ff.video_args(codec), "-movflags", "+faststart", output,
+    ])
+
+
+def ffmpeg_multi_trim(video_path, ranges, outputs, codec, audio_codec):
+    # One decode feeds every clip: split/asplit fan the stream out to one trim per range
+    has_audio = ff.first_stream(ff.probe(video_path), "audio") is not None
+    n = len(ranges)
+    parts = [f"[0:v]split={n}" + "".join(f"[vs{i}]" for i in range(n))]
+    if has_audio:
+        parts.append(f"[0:a]asplit={n}" + "".join(f"[as{i}]" for i in range(n)))
+    for i, (start, end) in enumerate(ranges):
+        parts.append(f"[vs{i}]trim=start={start:.6f}:end={end:.6f},setpts=PTS-STARTPTS[v{i}]")
+        if has_audio:
+            parts.append(f"[as{i}]atrim=start={start:.6f}:end={end:.6f},asetpts=PTS-STARTPTS[a{i}]")
+    # Nothing past the last range is needed, so the decode stops there instead of at the end of the file
+    last = max(end for _, end in ranges)
+    args = ["-t", f"{last:.6f}", "-i", video_path, "-filter_complex", ";".join(parts)]
+    for i, out in enumerate(outputs):
+        audio = ["-map", f"[a{i}]", "-c:a", audio_codec] if has_audio else []
+        args += ["-map", f"[v{i}]", *audio, "-c:v", codec, *ff.video_args(codec), "-max_muxing_queue_size", "4096",
+                 "-movflags", "+faststart", out]
+    ff.run_ffmpeg(args)
+
+
+def ffmpeg_concat(paths, output, codec, audio_codec):
+    infos = [ff.probe(p) for p in paths]
+    graph, with_audio = concat_graph(infos)
+    inputs = [arg for p in paths for arg in ("-i", p)]
+    maps = ["-map", "[v]"] + (["-map", "[a]", "-c:a", audio_codec] if with_audio else [])
+    ff.run_ffmpeg([*inputs, "-filter_complex", graph, *maps, "-c:v", codec, *ff.video_args(codec),
+                   "-movflags", "+faststart", output])
+
+
+def ffmpeg_background_music(video_path, audio_path, output, orig_vol, music_vol, audio_codec, loop=True):
+    info = ff.probe(video_path)
+    has_audio = ff.first_stream(info, "audio") is not None
+    graph = background_music_graph(ff.media_duration(info), has_audio, orig_vol, music_vol)
+    # Only the audio changes, so the video stream is copied as-is
+    ff.run_ffmpeg([
+        "-i", video_path, *(["-stream_loop", "-1"] if loop else []), "-i", audio_path, "-filter_complex", graph,
+        "-map", "0:v:0", "-map", "[a]", "-c:v", "copy", "-c:a", audio_codec,
+        "-movflags", "+faststart", output,
+    ])
+
+# ==============================
+# Segmented Parallel Backend
+# ==============================
+# Video is split at keyframes and encoded by parallel ffmpeg processes, then joined with the
+# concat demuxer. Audio is rendered once over the whole timeline so there are no seams.
+def segment_pieces(path, start, end, segments):
+    return [(path, s, e) for s, e in ff.split_ranges(ki.keyframes(path) or [], start, end, segments)]
+
+
+def segmented_trim(video_path, start, end, output, codec, audio_codec, segments):
+    has_audio = ff.first_stream(ff.probe(video_path), "audio") is not None
+    workdir = tempfile.mkdtemp(prefix="video_editor_segments_")
+    try:
+        parts = ff.encode_segments(segment_pieces(video_path, start, end, segments), workdir, codec)
+        video_only = ff.join_segments(parts, os.path.join(workdir, "video.mkv"))
+        ff.mux_with_audio(video_only, video_path if has_audio else None, output, audio_codec, start, end - start)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def segmented_merge(video_path, audio_path, output, codec, audio_codec, segments):
+    duration = ff.media_duration(ff.probe(video_path))
+    workdir = tempfile.mkdtemp(prefix="video_editor_segments_")
+    try:
+        parts = ff.encode_segments(segment_pieces(video_path, 0.0, duration, segments), workdir, codec)
+        video_only = ff.join_segments(parts, os.path.join(workdir, "video.mkv"))
+        ff.mux_with_audio(video_only, audio_path, output, audio_codec, 0.0, duration)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def segmented_concat(paths, output, codec, audio_codec, segments):
+    infos = [ff.probe(p) for p in paths]
+    durations = [ff.media_duration(info) for info in infos]
+    video_filter = normalize_filter(ff.first_stream(infos[0], "video"))
+    total = sum(durations) or 1.0
+    workdir = tempfile.mkdtemp(prefix="video_editor_segments_")
+    try:
+        pieces = []
+        for path, duration in zip(paths, durations):
+            # Segments are shared out in proportion to each input's duration
+            pieces += segment_pieces(path, 0.0, duration, max(1, round(segments * duration / total)))
+        parts = ff.encode_segments(pieces, workdir, codec, ["-vf", video_filter])
+        video_only = ff.join_segments(parts, os.path.join(workdir, "video.mkv"))
+        graph, with_audio = concat_graph(infos, video=False)
+        audio_only = None
+        if with_audio:
+            audio_only = os.path.join(workdir, "audio.mka")
+            inputs = [arg for p in paths for arg in ("-i", p)]
+            ff.run_ffmpeg([*inputs, "-filter_complex", graph, "-map", "[a]", "-c:a", audio_codec, audio_only], track=False)
+        ff.mux_with_audio(video_only, audio_only, output, "copy")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# ==============================
+# Pre-normalized Concatenation
+# ==============================
+# Inputs matching the dominant profile are only remuxed; the rest are conformed to it in
+# parallel ffmpeg processes, then everything is joined losslessly.
+AUDIO_ENCODERS = {"aac": "aac", "mp3": "libmp3lame", "opus": "libopus", "vorbis": "libvorbis", "ac3": "ac3"}
+
+
+def target_profile(infos):
+    # The signature covering the most playing time wins, so the most footage stays untouched
+    weights = {}
+    for info in infos:
+        signature = ff.stream_signature(info)
+        weights[signature] = weights.get(signature, 0.0) + ff.media_duration(info)
+    signature = max(weights, key=weights.get)
+    return next(info for info in infos if ff.stream_signature(info) == signature)
+
+
+def conform_args(path, info, target):
+    video, audio = ff.first_stream(target, "video"), ff.first_stream(target, "audio")
+    encoder = ff.SMART_RENDER_CODECS[video["codec_name"]][0]
+    width, height = video["width"], video["height"]
+    sar = (video.get("sample_aspect_ratio") or "1:1").replace(":", "/")
+    vf = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,"
+          f"setsar={sar},fps={video['r_frame_rate']},format={video['pix_fmt']}")
+    args = ["-i", path]
+    video_args = ["-map", "0:v:0", "-vf", vf, "-c:v", encoder]
+    video_args += ff.profile_args(video, encoder)
+    # The job's rate control and preset; codec and pix_fmt stay locked to the target for the stream-copy join
+    video_args += ff.video_args(encoder, threads=False, pix_fmt=False)
+    audio_args = []
+    if audio:
+        rate, channels = audio["sample_rate"], audio["channels"]
+        if ff.first_stream(info, "audio"):
+            audio_args = ["-map", "0:a:0"]
+        else:
+            args += ["-f", "lavfi", "-i", f"anullsrc=r={rate}:cl={audio.get('channel_layout') or 'stereo'}"]
+            audio_args = ["-map", "1:a:0"]
+        audio_args += ["-af", "apad", "-c:a", AUDIO_ENCODERS[audio["codec_name"]], "-ar", str(rate), "-ac", str(channels)]
+    return [*args, *video_args, *audio_args, "-t", f"{ff.media_duration(info):.6f}"]
+
+
+def normalized_concat(paths, output):
+    infos = [ff.probe(p) for p in paths]
+    target = target_profile(infos)
+    video, audio = ff.first_stream(target, "video"), ff.first_stream(target, "audio")
+    if not video or video.get("codec_name") not in ff.SMART_RENDER_CODECS:
+        raise ff.FFmpegError("No encoder for the target video codec")
+    if audio and audio.get("codec_name") not in AUDIO_ENCODERS:
+        raise ff.FFmpegError("No encoder for the target audio codec")
+    ext = ff.SMART_RENDER_CODECS[video["codec_name"]][1]
+    signature = ff.stream_signature(target)
+    workdir = tempfile.mkdtemp(prefix="video_editor_normalize_")
+    try:
+        parts, commands = [], []
+        for i, (path, info) in enumerate(zip(paths, infos)):
+            part = os.path.join(workdir, f"part{i:04d}{ext}")
+            parts.append(part)
+            if ff.stream_signature(info) == signature:
+                # Already conforming: remux only, so parameter sets travel in-band for the join
+                commands.append(["-i", path, "-map", "0:v:0", "-map", "0:a?", "-c", "copy", part])
+            else:
+                commands.append([*conform_args(path, info, target), part])
+        threads = max(1, (os.cpu_count() or 1) // max(len(commands), 1))
+        with ThreadPoolExecutor(min(len(commands), os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(ff.run_ffmpeg, [*cmd[:-1], "-threads", str(threads), cmd[-1]]) for cmd in commands]
+            for future in futures:
+                future.result()
+        ff.run_ffmpeg(["-f", "concat", "-safe", "0", "-i", ff.write_concat_list(parts, workdir),
+                       "-map", "0:v", "-map", "0:a?", "-c", "copy", "-movflags", "+faststart", output], track=False)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# ==============================
+# moviepy Backend (fallback)
+# ==============================
+def moviepy_merge(video_path, audio_path, output, codec, audio_codec, logger_factory=None):
+    from moviepy import VideoFileClip, AudioFileClip
+
+    video, audio = VideoFileClip(video_path), AudioFileClip(audio_path)
+    output_video = video.with_audio(audio.subclipped(0, min(audio.duration, video.duration)))
+    output_video.write_videofile(output, codec=codec, audio_codec=audio_codec, logger=make_logger(logger_factory, output_video),
+                                  **ff.moviepy_options(codec))
+    uf.close_and_remove(output_video, video, audio)
+
+
+def moviepy_trim(video_path, start, end, output, codec, audio_codec, logger_factory=None):
+    from moviepy import VideoFileClip
+
+    video = VideoFileClip(video_path)
+    sub_clip = video.subclipped(start, end)
+    sub_clip.write_videofile(output, codec=codec, audio_codec=audio_codec, logger=make_logger(logger_factory, sub_clip),
+                                  **ff.moviepy_options(codec))
+    uf.close_and_remove(sub_clip, video)
+
+
+def moviepy_multi_trim(video_path, ranges, outputs, codec, audio_codec, logger_factory=None):
+    from moviepy import VideoFileClip
+
+    # One reader for all clips instead of reopening the source per clip
+    video = VideoFileClip(video_path)
+    for (start, end), out in zip(ranges, outputs):
+        sub_clip = video.subclipped(start, end)
+        sub_clip.write_videofile(out, codec=codec, audio_codec=audio_codec, logger=make_logger(logger_factory, sub_clip),
+                                  **ff.moviepy_options(codec))
+        sub_clip.close()
+    video.close()
+
+
+def moviepy_concat(paths, output, codec, audio_codec, logger_factory=None):
+    from moviepy import VideoFileClip, concatenate_videoclips
+
+    clips = [VideoFileClip(p) for p in paths]
+    final_clip = concatenate_videoclips(clips)
+    final_clip.write_videofile(output, codec=codec, audio_codec=audio_codec, logger=make_logger(logger_factory, final_clip),
+                                  **ff.moviepy_options(codec))
+    uf.close_and_remove(final_clip, *clips)
+
+
+def moviepy_background_music(video_path, audio_path, output, orig_vol, music_vol, codec, audio_codec,
+                             logger_factory=None, loop=True):
+    from moviepy import VideoFileClip, AudioFileClip, CompositeAudioClip, afx
+
+    video, audio = VideoFileClip(video_path), AudioFileClip(audio_path)
+    video_audio = video.audio.with_volume_scaled(orig_vol) if video.audio else None
+    if loop and audio.duration < video.duration:
+        cut_music = audio.with_effects([afx.AudioLoop(duration=video.duration)]).with_volume_scaled(music_vol)
+    else:
+        cut_music = audio.subclipped(0, min(audio.duration, video.duration)).with_volume_scaled(music_vol)
+    final_audio = CompositeAudioClip([video_audio, cut_music]) if video_audio else cut_music
+    output_video = video.with_audio(final_audio)
+    output_video.write_videofile(output, codec=codec, audio_codec=audio_codec, logger=make_logger(logger_factory, output_video),
+                                  **ff.moviepy_options(codec))
+    uf.close_and_remove(output_video, video, audio)
+
+# ==============================
+# Tool Operations
+# ==============================
+# Each operation tries the cheapest ffmpeg path first and falls back to moviepy.
+def source_duration(path):
+    try:
+        return ff.media_duration(ff.probe(path))
+    except ff.FFmpegError:
+        return 0.0
+
+
+def output_duration(tool, params):
+    if tool == "trim":
+        return params["end"] - params["start"]
+    if tool == "trim_many":
+        return sum(end - start for start, end in params["ranges"])
+    if tool == "concatenate":
+        return sum(source_duration(p) for p in params["paths"])
+    return source_duration(params["video_path"])
+
+
+def merge_audio(video_path, audio_path, output, codec="libx264", audio_codec="aac",
+                copy_video=True, engine="ffmpeg", segments=None, logger_factory=None):
+    if copy_video and try_ffmpeg(ff.mux_audio, video_path, audio_path, output, audio_codec=audio_codec):
+        return output
+    if engine == "ffmpeg":
+        count = segment_count(source_duration(video_path), segments)
+        if count > 1 and try_ffmpeg(segmented_merge, video_path, audio_path, output, codec, audio_codec, count):
+            return output
+        if try_ffmpeg(ffmpeg_merge, video_path, audio_path, output, codec, audio_codec):
+            return output
+    moviepy_merge(video_path, audio_path, output, codec, audio_codec, logger_factory)
+    return output
+
+
+def trim(video_path, start, end, output, codec="libx264", audio_codec="aac",
+         lossless=True, snap=False, engine="ffmpeg", segments=None, logger_factory=None):
+    # Returns the start time actually used (differs from `start` when snapped to a keyframe)
+    keyframes = ki.keyframes(video_path)
+    if lossless and snap:
+        try:
+            return ff.snap_trim(video_path, start, end, output, keyframes)
+        except ff.FFmpegError:
+            pass
+    if lossless and try_ffmpeg(ff.smart_trim, video_path, start, end, output, codec=codec,
+                               audio_codec=audio_codec, keyframes=keyframes, packets=ki.packets(video_path)):
+        return start
+    if engine == "ffmpeg":
+        count = segment_count(end - start, segments)
+        if count > 1 and try_ffmpeg(segmented_trim, video_path, start, end, output, codec, audio_codec, count):
+            return start
+        if try_ffmpeg(ffmpeg_trim, video_path, start, end, output, codec, audio_codec, keyframes):
+            return start
+    moviepy_trim(video_path, start, end, output, codec, audio_codec, logger_factory)
+    return start
+
+
+def lossless_multi_trim(video_path, ranges, outputs, codec, audio_codec, snap, keyframes):
+    # Stream-copy cuts are I/O bound, so all clips are cut in parallel
+    cut = ff.snap_trim if snap else ff.smart_trim
+    packets = ki.packets(video_path)
+    with ThreadPoolExecutor(min(len(ranges), os.cpu_count() or 1)) as pool:
+        futures = [
+            pool.submit(cut, video_path, start, end, out, keyframes=keyframes) if snap else
+            pool.submit(cut, video_path, start, end, out, codec=codec, audio_codec=audio_codec, keyframes=keyframes,
+                        packets=packets)
+            for (start, end), out in zip(ranges, outputs)
+        ]
+        for future in futures:
+            future.result()
+
+
+def trim_many(video_path, ranges, output, codec="libx264", audio_codec="aac",
+              lossless=True, snap=False, engine="ffmpeg", segments=None, logger_factory=None):
+    # Cuts every (start, end) range and bundles the clips into the zip at `output`
+    ranges = [(float(start), float(end)) for start, end in ranges]
+    keyframes = ki.keyframes(video_path)
+    workdir = tempfile.mkdtemp(prefix="video_editor_cuts_")
+    try:
+        outputs = [os.path.join(workdir, f"clip_{i + 1:02d}_{int(s)}-{int(e)}.mp4") for i, (s, e) in enumerate(ranges)]
+        done = lossless and try_ffmpeg(lossless_multi_trim, video_path, ranges, outputs, codec, audio_codec, snap, keyframes)
+        if not done and engine == "ffmpeg":
+            done = try_ffmpeg(ffmpeg_multi_trim, video_path, ranges, outputs, codec, audio_codec)
+        if not done:
+            moviepy_multi_trim(video_path, ranges, outputs, codec, audio_codec, logger_factory)
+        # Clips are already compressed, so the zip only stores them
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) as bundle:
+            for out in outputs:
+                bundle.write(out, os.path.basename(out))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return len(ranges)
+
+
+def concatenate(paths, output, codec="libx264", audio_codec="aac", engine="ffmpeg", segments=None, logger_factory=None):
+    if ff.can_concat_copy(paths) and try_ffmpeg(ff.concat_copy, paths, output):
+        return output
+    if engine == "ffmpeg" and try_ffmpeg(normalized_concat, paths, output):
+        return output
+    if engine == "ffmpeg":
+        count = segment_count(sum(source_duration(p) for p in paths), segments)
+        if count > 1 and try_ffmpeg(segmented_concat, paths, output, codec, audio_codec, count):
+            return output
+        if try_ffmpeg(ffmpeg_concat, paths, output, codec, audio_codec):
+            return output
+    moviepy_concat(paths, output, codec, audio_codec, logger_factory)
+    return output
+
+
+def add_background_music(video_path, audio_path, output, orig_vol=1.0, music_vol=0.5, duck_db=0.0, limiter=True,
+                         loop=True, codec="libx264", audio_codec="aac", engine="ffmpeg", segments=None, logger_factory=None):
+    # The ffmpeg paths copy the video stream, so there is nothing to split into segments.
+    # Ducking and limiting only exist in the NumPy mixer; the filter graph is a plain fallback.
+    import audio_mixer as am
+
+    if engine == "ffmpeg" and try_ffmpeg(am.mix_background_music, video_path, audio_path, output,
+                                         orig_vol, music_vol, audio_codec, duck_db, limiter, loop):
+        return output
+    if engine == "ffmpeg" and try_ffmpeg(ffmpeg_background_music, video_path, audio_path, output,
+                                         orig_vol, music_vol, audio_codec, loop):
+        return output
+    moviepy_background_music(video_path, audio_path, output, orig_vol, music_vol, codec, audio_codec, logger_factory, loop)
+    return output